@@ -0,0 +1,143 @@
+# ASGI-вход: те же маршруты и ресурсы, что у app.py (register, login,
+# products, cart, checkout, orders), под асинхронным сервером и с
+# асинхронным драйвером БД (aiosqlite, для PostgreSQL — asyncpg).
+#   uvicorn asgi:app
+#   uvicorn --factory asgi:create_asgi_app
+# Обработчик асинхронный: тело запроса читается, а ответ отправляется через
+# event loop. Ресурсы и бизнес-логика общие с синхронным приложением и
+# выполняются в гринлете SQLAlchemy (greenlet_spawn): каждый запрос к БД и
+# хэширование пароля ждут через await и отдают loop другим запросам, так что
+# один процесс держит много одновременных соединений без потока на каждое.
+# Адрес БД — ASYNC_DATABASE_URI или SQLALCHEMY_DATABASE_URI с асинхронным
+# драйвером; схему по-прежнему создаёт flask --app app migrate.
+import io
+import os
+import sys
+
+from sqlalchemy.util import await_only, greenlet_spawn
+
+from app import create_app
+from config import Config
+from database import async_database_uri
+from security import in_event_loop
+
+
+def create_asgi_app(config=None):
+    # config — как у create_app; адрес БД переводится на асинхронный драйвер
+    config = dict(config or {})
+    uri = config.get('SQLALCHEMY_DATABASE_URI') or os.environ.get('ASYNC_DATABASE_URI') \
+        or Config.SQLALCHEMY_DATABASE_URI
+    config['SQLALCHEMY_DATABASE_URI'] = async_database_uri(uri)
+    return ASGIApp(create_app(config))
+
+
+def wsgi_environ(scope, body):
+    # WSGI-окружение для Flask из ASGI scope. Строки WSGI — latin-1.
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    root_path = scope.get('root_path', '')
+    path = scope['path']
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': root_path.encode('utf-8').decode('latin-1'),
+        'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': 'HTTP/%s' % scope.get('http_version', '1.1'),
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': False,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name != 'CONTENT_LENGTH':
+            key = 'HTTP_' + name
+            environ[key] = environ[key] + ',' + value if key in environ else value
+    return environ
+
+
+class ASGIApp:
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            await self.http(scope, receive, send)
+        elif scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        else:
+            raise ValueError('Unsupported ASGI scope type %s' % scope['type'])
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                # Соединения aiosqlite держат свои потоки: без dispose процесс не завершится
+                await greenlet_spawn(self.dispose)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def dispose(self):
+        from extensions import db
+        with self.flask_app.app_context():
+            db.engine.dispose()
+
+    async def http(self, scope, receive, send):
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+        token = in_event_loop.set(True)
+        try:
+            await greenlet_spawn(self.respond, wsgi_environ(scope, bytes(body)), send)
+        finally:
+            in_event_loop.reset(token)
+
+    def respond(self, environ, send):
+        # Выполняется в гринлете: await_only отдаёт управление event loop
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                   for name, value in headers]
+
+        result = self.flask_app.wsgi_app(environ, start_response)
+        try:
+            await_only(send({'type': 'http.response.start', 'status': response['status'],
+                             'headers': response['headers']}))
+            for chunk in result:
+                if chunk:
+                    await_only(send({'type': 'http.response.body', 'body': chunk, 'more_body': True}))
+            await_only(send({'type': 'http.response.body', 'body': b''}))
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+
+
+def __getattr__(name):
+    # asgi:app для uvicorn: приложение создаётся при первом обращении
+    if name == 'app':
+        global app
+        app = create_asgi_app()
+        return app
+    raise AttributeError(name)
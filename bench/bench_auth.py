@@ -0,0 +1,63 @@
+# Стоимость проверки токена на один запрос: разбор и проверка подписи
+# JWT, проверка отзыва (denylist) и пользователь из кэша — то, что делает
+# @jwt_required() перед каждым защищённым ресурсом, без самого ресурса.
+#
+#   python bench/bench_auth.py [проверок] [отозванных токенов в denylist]
+import os
+import sys
+import time
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def main():
+    checks = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    revoked = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+
+    from flask_jwt_extended import current_user, verify_jwt_in_request
+    from sqlalchemy import insert
+    from app import create_app
+    from extensions import db
+    from migrations import upgrade
+    from models import RevokedToken, User
+    from resources.auth import issue_tokens
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+                      'JWT_SIGNING_KEYS': {'old': 'old-secret', 'new': 'new-secret'},
+                      'JWT_SIGNING_KEY_ID': 'new'})
+    with app.app_context():
+        upgrade()
+        user = User(username='bench', password='-')
+        db.session.add(user)
+        expires_at = time.time() + 3600
+        db.session.execute(insert(RevokedToken), [{'jti': str(uuid.uuid4()), 'expires_at': expires_at}
+                                                  for _ in range(revoked)])
+        db.session.commit()
+        token = issue_tokens(user)['access_token']
+    headers = {'Authorization': 'Bearer ' + token}
+
+    def check():
+        with app.test_request_context(headers=headers):
+            verify_jwt_in_request()
+            return current_user.id
+
+    check()  # прогрев: первая синхронизация denylist и загрузка пользователя в кэш
+    started = time.perf_counter()
+    for _ in range(checks):
+        with app.test_request_context(headers=headers):
+            pass
+    context = (time.perf_counter() - started) / checks
+
+    started = time.perf_counter()
+    for _ in range(checks):
+        check()
+    total = (time.perf_counter() - started) / checks
+    print('%d checks, %d revoked tokens in denylist' % (checks, revoked))
+    print('request context alone: %.1f us' % (context * 1e6))
+    print('with token verification: %.1f us, auth overhead %.1f us' % (total * 1e6, (total - context) * 1e6))
+
+
+if __name__ == '__main__':
+    main()
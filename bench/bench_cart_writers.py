@@ -0,0 +1,79 @@
+# Конкурентная запись в корзину из нескольких процессов (как воркеры
+# gunicorn) в одну SQLite-базу. Считает ошибки "database is locked".
+# Запуск из корня репозитория:
+#   python bench/bench_cart_writers.py [процессов] [запросов на процесс]
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def writer(uri, username, requests, results):
+    os.environ['SQLALCHEMY_DATABASE_URI'] = uri
+    sys.path.insert(0, ROOT)
+    from flask_jwt_extended import create_access_token
+    from app import app
+    from models import User
+
+    with app.app_context():
+        user = User.query.filter_by(username=username).first()
+        token = create_access_token(identity=user.username, additional_claims={'uid': user.id})
+    client = app.test_client()
+    headers = {'Authorization': 'Bearer ' + token}
+    errors = 0
+    for _ in range(requests):
+        try:
+            response = client.post('/cart', json={'product_id': 1}, headers=headers)
+            if response.status_code != 201:
+                errors += 1
+        except Exception as exc:  # OperationalError: database is locked
+            print(username, exc.__class__.__name__, exc, file=sys.stderr)
+            errors += 1
+    results.put(errors)
+
+
+def main():
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    uri = 'sqlite:///' + path
+    os.environ['SQLALCHEMY_DATABASE_URI'] = uri
+    sys.path.insert(0, ROOT)
+    from app import app
+    from extensions import db
+    from migrations import upgrade
+    from models import Product, User
+
+    with app.app_context():
+        upgrade()
+        db.session.add(Product(id=1, name='Bench product', category='Bench', price=1.0))
+        for number in range(processes):
+            # Хэш не нужен: токены выдаются напрямую, без /login
+            db.session.add(User(username='writer%d' % number, password='-'))
+        db.session.commit()
+        db.engine.dispose()
+
+    ctx = multiprocessing.get_context('spawn')
+    results = ctx.Queue()
+    workers = [ctx.Process(target=writer, args=(uri, 'writer%d' % number, requests, results))
+               for number in range(processes)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    errors = sum(results.get() for _ in workers)
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    total = processes * requests
+    print('%d processes x %d cart writes: %.2f s, %.0f writes/s, %d errors'
+          % (processes, requests, elapsed, total / elapsed, errors))
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == '__main__':
+    main()
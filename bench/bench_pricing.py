@@ -0,0 +1,48 @@
+# Микробенчмарк pricing.price_batch: расчёт цен для N позиций.
+# Запуск из корня репозитория: python bench/bench_pricing.py [N]
+import os
+import random
+import sys
+import time
+from collections import namedtuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pricing import PricingRules, price_batch  # noqa: E402
+
+BenchProduct = namedtuple('BenchProduct', 'price category discounted discount_type discount_amount')
+
+
+def make_lines(count, seed=0):
+    rnd = random.Random(seed)
+    categories = ['Electronics', 'Clothing', 'Books', 'Home', 'Toys']
+    catalog = []
+    for _ in range(10000):
+        kind = rnd.choice([None, 'Percentage', 'Fixed'])
+        catalog.append(BenchProduct(
+            price=round(rnd.uniform(1, 1000), 2),
+            category=rnd.choice(categories),
+            discounted=kind is not None,
+            discount_type=kind,
+            discount_amount=rnd.choice([5, 10, 15, 2.5]) if kind else None,
+        ))
+    products = [rnd.choice(catalog) for _ in range(count)]
+    quantities = [rnd.randint(1, 10) for _ in range(count)]
+    return products, quantities
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    products, quantities = make_lines(count)
+    rules = PricingRules({'Electronics': 5, 'Books': 10}, [(3, 5), (10, 10)])
+    for stack in (True, False):
+        rules.stack = stack
+        started = time.perf_counter()
+        priced = price_batch(products, quantities, rules)
+        elapsed = time.perf_counter() - started
+        print('stack=%-5s %d lines: %.2f s, %.0f lines/s, total %s'
+              % (stack, count, elapsed, count / elapsed, priced.total))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+# Время поиска search_products (FTS5 + фасеты) на большом каталоге:
+# узкие и широкие запросы, короткие префиксы, запросы с фильтрами.
+# Кэш каталога не участвует — каждый запрос идёт в БД.
+#
+#   python bench/bench_search.py [товаров] [повторов]
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+ADJECTIVES = ['red', 'blue', 'green', 'black', 'white', 'small', 'large', 'classic', 'premium', 'compact',
+              'wireless', 'portable', 'digital', 'wooden', 'steel', 'cotton', 'leather', 'smart', 'mini', 'pro']
+NOUNS = ['phone', 'laptop', 'shirt', 'jacket', 'chair', 'table', 'lamp', 'book', 'kettle', 'speaker',
+         'camera', 'watch', 'backpack', 'bottle', 'keyboard', 'mouse', 'monitor', 'sofa', 'pillow', 'toy']
+CATEGORIES = ['Electronics', 'Clothing', 'Books', 'Home', 'Toys', 'Sports', 'Garden', 'Office']
+QUERIES = [
+    ('редкое слово', {'query': 'x1234'}),
+    ('широкое слово', {'query': 'phone'}),
+    ('два слова', {'query': 'wireless phone'}),
+    ('2 буквы', {'query': 'p1'}),
+    ('префикс 3 буквы', {'query': 'lam'}),
+    ('широкое + категория', {'query': 'red', 'category': 'Home'}),
+    ('широкое + скидка', {'query': 'book', 'discounted': True}),
+]
+
+
+def main():
+    products = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    from sqlalchemy import insert
+    from app import create_app
+    from extensions import db
+    from migrations import upgrade
+    from models import Product
+    from search import search_products
+
+    directory = tempfile.mkdtemp()
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(directory, 'bench.db')})
+    rnd = random.Random(0)
+    with app.app_context():
+        upgrade()
+        started = time.perf_counter()
+        batch = 50000
+        for first in range(1, products + 1, batch):
+            db.session.execute(insert(Product), [{
+                # Модель вида p1234 / x1234: короткие и редкие токены рядом с частыми словами
+                'id': product_id, 'name': '%s %s %s%d' % (rnd.choice(ADJECTIVES), rnd.choice(NOUNS),
+                                                          rnd.choice('px'), rnd.randint(1, 99999)),
+                'category': rnd.choice(CATEGORIES), 'price': round(rnd.uniform(1, 1000), 2),
+                'discounted': rnd.random() < 0.2,
+            } for product_id in range(first, min(first + batch, products + 1))])
+            db.session.commit()
+        print('%d products loaded in %.1f s' % (products, time.perf_counter() - started))
+
+        for title, kwargs in QUERIES:
+            timings = []
+            for _ in range(repeats):
+                started = time.perf_counter()
+                ids, total, facets, exact = search_products(db.session, limit=20, **kwargs)
+                timings.append(time.perf_counter() - started)
+            print('%-22s %7.2f ms median, %7.2f ms best, total %d%s' % (
+                title, statistics.median(timings) * 1000, min(timings) * 1000, total, '' if exact else ' (оценка)'))
+        db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+# GET /products/<id> из общего снимка каталога (snapshot.py) против
+# кэша каталога процесса и загрузки из БД. Считает время сборки снимка,
+# его размер и стоимость одного поиска товара.
+#
+#   python bench/bench_snapshot.py [товаров] [поисков]
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def main():
+    products = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    lookups = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+
+    from sqlalchemy import insert
+    from app import create_app
+    from extensions import catalog_cache, catalog_snapshot, db
+    from migrations import upgrade
+    from models import Product
+    from resources.catalog import ProductList
+    from snapshot import build
+
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'catalog.snap')
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(directory, 'bench.db'),
+                      'CATALOG_SNAPSHOT_PATH': path,
+                      'CATALOG_CACHE_SIZE': lookups})  # кэш вмещает все запрошенные товары
+    rnd = random.Random(0)
+    with app.app_context():
+        upgrade()
+        db.session.execute(insert(Product), [{
+            'id': product_id, 'name': 'Product %d' % product_id, 'category': rnd.choice('ABCDEFGH'),
+            'price': round(rnd.uniform(1, 1000), 2), 'discounted': False,
+        } for product_id in range(1, products + 1)])
+        db.session.commit()
+
+        started = time.perf_counter()
+        build(path)
+        print('%d products: snapshot built in %.2f s, %.1f MB' % (
+            products, time.perf_counter() - started, os.path.getsize(path) / 1e6))
+
+        ids = [rnd.randint(1, products) for _ in range(lookups)]
+        catalog_snapshot.lookup(1)  # первое отображение файла
+
+        def measure(fn):
+            started = time.perf_counter()
+            for product_id in ids:
+                fn(product_id)
+            return (time.perf_counter() - started) / lookups * 1e6
+
+        snapshot = measure(catalog_snapshot.lookup)
+        database = measure(ProductList.load_product)
+        for product_id in ids:
+            catalog_cache.get_or_load(('id', product_id), lambda: ProductList.load_product(product_id))
+        cached = measure(lambda product_id: catalog_cache.get(('id', product_id)))
+        db.engine.dispose()
+
+    print('per lookup: snapshot %.1f us, process cache hit %.1f us, database %.1f us' % (snapshot, cached, database))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+# Время запуска приложения: импорт модулей, создание приложения
+# (create_app) и первый запрос — то, что каждый воркер gunicorn и каждый
+# тест платят до первой полезной работы. Каждый замер — новый процесс
+# интерпретатора, база заранее создана, поэтому в замер не попадает DDL.
+#
+#   python bench/bench_startup.py --runs 20
+#   python bench/bench_startup.py --apps 50   # + create_app() в одном процессе, как в тестах
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = '''
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+application = app.create_app() if hasattr(app, 'create_app') else app.app
+created = time.perf_counter()
+application.test_client().get('/metrics')
+served = time.perf_counter()
+json.dump({'import': imported - started, 'create': created - imported,
+           'first_request': served - created, 'total': served - started,
+           'modules': len(sys.modules)}, sys.stdout)
+'''
+
+PREPARE = '''
+import app
+if hasattr(app, 'create_app'):
+    from migrations import upgrade
+    with app.create_app().app_context():
+        upgrade()
+'''
+
+APPS = '''
+import json, sys, time
+from app import create_app
+durations = []
+for _ in range(%d):
+    started = time.perf_counter()
+    create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+    durations.append(time.perf_counter() - started)
+json.dump(durations, sys.stdout)
+'''
+
+
+def run(code, env):
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, check=True,
+                            stdout=subprocess.PIPE).stdout
+    return json.loads(output) if output else None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--apps', type=int, default=0, help='create_app() calls in one process (factory only)')
+    args = parser.parse_args()
+
+    database = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'startup.db')
+    env = dict(os.environ, SQLALCHEMY_DATABASE_URI=database, PYTHONDONTWRITEBYTECODE='')
+    run(PREPARE, env)  # схема и прогретый кэш байткода
+
+    samples = [run(CHILD, env) for _ in range(args.runs)]
+    print('%-14s %9s %9s' % ('phase', 'median ms', 'min ms'))
+    for phase in ('import', 'create', 'first_request', 'total'):
+        values = [sample[phase] * 1000 for sample in samples]
+        print('%-14s %9.1f %9.1f' % (phase, statistics.median(values), min(values)))
+    print('modules loaded: %d' % samples[0]['modules'])
+
+    if args.apps:
+        durations = run(APPS % args.apps, env)
+        print('create_app() in-process: median %.2f ms over %d apps'
+              % (statistics.median(durations) * 1000, len(durations)))
+
+
+if __name__ == '__main__':
+    main()
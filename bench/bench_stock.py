@@ -0,0 +1,101 @@
+# Проверка на перепродажу: несколько процессов (как воркеры gunicorn)
+# одновременно добавляют товар с ограниченным остатком в корзину и
+# оформляют заказ. Продано должно быть ровно столько, сколько было на
+# складе, остаток не может уйти в минус.
+# Запуск из корня репозитория:
+#   python bench/bench_stock.py [процессов] [попыток на процесс] [остаток]
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def buyer(uri, username, attempts, results):
+    os.environ['SQLALCHEMY_DATABASE_URI'] = uri
+    sys.path.insert(0, ROOT)
+    from flask_jwt_extended import create_access_token
+    from app import app
+    from models import User
+
+    with app.app_context():
+        user = User.query.filter_by(username=username).first()
+        token = create_access_token(identity=user.username, additional_claims={'uid': user.id})
+    client = app.test_client()
+    headers = {'Authorization': 'Bearer ' + token}
+    counts = {'ordered': 0, 'out_of_stock': 0, 'errors': 0}
+    for _ in range(attempts):
+        try:
+            added = client.post('/cart', json={'product_id': 1}, headers=headers)
+            if added.status_code == 409:
+                counts['out_of_stock'] += 1
+                continue
+            placed = client.post('/checkout', headers=headers)
+            if placed.status_code == 201:
+                counts['ordered'] += sum(item['quantity'] for item in placed.get_json()['ordered_items'])
+            elif placed.status_code == 409:
+                counts['out_of_stock'] += 1
+            else:
+                counts['errors'] += 1
+        except Exception as exc:
+            print(username, exc.__class__.__name__, exc, file=sys.stderr)
+            counts['errors'] += 1
+    results.put(counts)
+
+
+def main():
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    attempts = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    stock = int(sys.argv[3]) if len(sys.argv) > 3 else processes * attempts // 2
+
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    uri = 'sqlite:///' + path
+    os.environ['SQLALCHEMY_DATABASE_URI'] = uri
+    sys.path.insert(0, ROOT)
+    from sqlalchemy import func
+    from app import app
+    from extensions import db
+    from migrations import upgrade
+    from models import OrderItem, Product, User
+
+    with app.app_context():
+        upgrade()
+        db.session.add(Product(id=1, name='Limited product', category='Bench', price=1.0, stock=stock))
+        for number in range(processes):
+            db.session.add(User(username='buyer%d' % number, password='-'))
+        db.session.commit()
+        db.engine.dispose()
+
+    ctx = multiprocessing.get_context('spawn')
+    results = ctx.Queue()
+    workers = [ctx.Process(target=buyer, args=(uri, 'buyer%d' % number, attempts, results))
+               for number in range(processes)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    totals = {'ordered': 0, 'out_of_stock': 0, 'errors': 0}
+    for _ in workers:
+        for key, value in results.get().items():
+            totals[key] += value
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        left = db.session.get(Product, 1).stock
+        sold = db.session.query(func.coalesce(func.sum(OrderItem.quantity), 0)).scalar()
+
+    print('%d processes x %d attempts, stock %d: %.2f s, %.0f checkouts/s'
+          % (processes, attempts, stock, elapsed, totals['ordered'] / elapsed))
+    print('sold %d (reported %d), left %d, rejected %d, errors %d'
+          % (sold, totals['ordered'], left, totals['out_of_stock'], totals['errors']))
+    oversold = sold + left != stock or left < 0 or sold != totals['ordered']
+    if oversold:
+        print('STOCK MISMATCH')
+    sys.exit(1 if oversold or totals['errors'] else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,341 @@
+# Нагрузочный тест REST API: заполняет базу синтетическим каталогом и
+# пользователями, гоняет смешанную нагрузку (регистрация, вход, каталог,
+# корзина, оформление заказа) и сохраняет RPS, p50/p95/p99 и число
+# SQL-запросов на запрос в JSON для сравнения прогонов.
+#
+# Примеры (из корня репозитория):
+#   python bench/loadtest.py --products 100000 --users 1000 --threads 8
+#   python bench/loadtest.py --mode gunicorn --workers 4 --threads 32
+#   python bench/loadtest.py --compare bench/results/previous.json
+# Пропускная способность при многих одновременных соединениях: синхронные
+# воркеры gunicorn против ASGI-входа (asgi.py) под uvicorn, одна база:
+#   python bench/loadtest.py --mode gunicorn --workers 4 --threads 64 --output bench/results/sync.json
+#   python bench/loadtest.py --mode asgi --workers 4 --threads 64 --compare bench/results/sync.json
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CATEGORIES = ['Electronics', 'Clothing', 'Books', 'Home', 'Toys', 'Sports', 'Garden', 'Food']
+PASSWORD = 'bench-password'
+
+# Доля операций в смешанной нагрузке
+DEFAULT_MIX = {
+    'products': 30,
+    'product': 25,
+    'cart_get': 15,
+    'cart_add': 15,
+    'cart_delete': 5,
+    'checkout': 5,
+    'login': 4,
+    'register': 1,
+}
+
+
+def seed(products, users, chunk_size=10000):
+    from sqlalchemy import insert
+    from werkzeug.security import generate_password_hash
+    from app import app
+    from extensions import db
+    from migrations import upgrade
+    from models import Product, User
+
+    rnd = random.Random(0)
+    started = time.perf_counter()
+    with app.app_context():
+        upgrade()
+        for offset in range(0, products, chunk_size):
+            rows = []
+            for product_id in range(offset + 1, min(offset + chunk_size, products) + 1):
+                kind = rnd.choice([None, None, 'Percentage', 'Fixed'])
+                rows.append({
+                    'id': product_id,
+                    'name': 'Product %d' % product_id,
+                    'category': rnd.choice(CATEGORIES),
+                    'price': round(rnd.uniform(1, 1000), 2),
+                    'discounted': kind is not None,
+                    'discount_type': kind,
+                    'discount_amount': rnd.choice([5, 10, 15]) if kind else None,
+                })
+            db.session.execute(insert(Product), rows)
+            db.session.commit()
+        # Один хэш на всех: пароль одинаковый, а хэшировать миллион раз долго
+        password = generate_password_hash(PASSWORD, app.config['PASSWORD_HASH_METHOD'])
+        for offset in range(0, users, chunk_size):
+            db.session.execute(insert(User), [
+                {'username': 'bench%d' % number, 'password': password}
+                for number in range(offset, min(offset + chunk_size, users))
+            ])
+            db.session.commit()
+        db.engine.dispose()
+    return time.perf_counter() - started
+
+
+class InProcessClient:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, body=None, headers=None):
+        response = self.client.open(path, method=method, json=body, headers=headers)
+        return response.status_code, response.headers, response.get_json(silent=True)
+
+
+class HttpClient:
+    def __init__(self, host, port):
+        self.connection = http.client.HTTPConnection(host, port, timeout=30)
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        try:
+            self.connection.request(method, path, payload, headers)
+            response = self.connection.getresponse()
+        except (http.client.HTTPException, OSError):
+            self.connection.close()
+            raise
+        data = response.read()
+        try:
+            parsed = json.loads(data) if data else None
+        except ValueError:
+            parsed = None
+        return response.status, response.headers, parsed
+
+
+def queries_from(headers):
+    # X-Debug-Timing: total;dur=..., db;dur=...;count=N, serialize;dur=...
+    timing = headers.get('X-Debug-Timing') or ''
+    for part in timing.split(','):
+        for field in part.split(';'):
+            if field.strip().startswith('count='):
+                return int(field.strip()[len('count='):])
+    return None
+
+
+class VirtualUser:
+    def __init__(self, client, number, products, rnd):
+        self.client = client
+        self.username = 'bench%d' % number
+        self.products = products
+        self.rnd = rnd
+        self.token = None
+        self.cart = []
+
+    def call(self, method, path, body=None, auth=True):
+        headers = {'X-Debug-Timing': '1'}
+        if auth and self.token:
+            headers['Authorization'] = 'Bearer ' + self.token
+        return self.client.request(method, path, body, headers)
+
+    def login(self):
+        response = self.call('POST', '/login', {'username': self.username, 'password': PASSWORD}, auth=False)
+        if response[0] == 200:
+            self.token = response[2]['access_token']
+        return response
+
+    def register(self):
+        username = 'new-%s-%d' % (self.username, self.rnd.getrandbits(48))
+        return self.call('POST', '/register', {'username': username, 'password': PASSWORD}, auth=False)
+
+    def products_page(self):
+        after = self.rnd.randint(0, max(self.products - 50, 0))
+        return self.call('GET', '/products?limit=50&after=%d' % after)
+
+    def product(self):
+        return self.call('GET', '/products/%d' % self.rnd.randint(1, self.products))
+
+    def cart_get(self):
+        return self.call('GET', '/cart')
+
+    def cart_add(self):
+        product_id = self.rnd.randint(1, self.products)
+        response = self.call('POST', '/cart', {'product_id': product_id})
+        if response[0] == 201:
+            self.cart.append(product_id)
+        return response
+
+    def cart_delete(self):
+        if not self.cart:
+            return self.cart_add()
+        return self.call('DELETE', '/cart/%d' % self.cart.pop())
+
+    def checkout(self):
+        if not self.cart:
+            self.cart_add()
+        response = self.call('POST', '/checkout')
+        if response[0] == 201:
+            self.cart = []
+        return response
+
+
+OPERATIONS = {
+    'products': VirtualUser.products_page,
+    'product': VirtualUser.product,
+    'cart_get': VirtualUser.cart_get,
+    'cart_add': VirtualUser.cart_add,
+    'cart_delete': VirtualUser.cart_delete,
+    'checkout': VirtualUser.checkout,
+    'login': VirtualUser.login,
+    'register': VirtualUser.register,
+}
+
+
+def run_worker(make_client, number, args, mix, samples, deadline):
+    rnd = random.Random(number)
+    user = VirtualUser(make_client(), number % args.users, args.products, rnd)
+    user.login()
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    while time.perf_counter() < deadline:
+        name = rnd.choices(names, weights)[0]
+        started = time.perf_counter()
+        try:
+            status, headers, _ = OPERATIONS[name](user)
+            queries = queries_from(headers)
+        except Exception:
+            status, queries = None, None
+        samples.append((name, time.perf_counter() - started, status, queries))
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def summarize(samples, elapsed):
+    def stats(rows):
+        latencies = sorted(row[1] for row in rows)
+        queries = [row[3] for row in rows if row[3] is not None]
+        errors = sum(1 for row in rows if row[2] is None or row[2] >= 500)
+        return {
+            'count': len(rows),
+            'errors': errors,
+            'rps': len(rows) / elapsed,
+            'p50_ms': percentile(latencies, 0.50) * 1000 if latencies else None,
+            'p95_ms': percentile(latencies, 0.95) * 1000 if latencies else None,
+            'p99_ms': percentile(latencies, 0.99) * 1000 if latencies else None,
+            'queries_per_request': sum(queries) / len(queries) if queries else None,
+        }
+
+    by_name = {}
+    for row in samples:
+        by_name.setdefault(row[0], []).append(row)
+    return {'total': stats(samples), 'endpoints': {name: stats(rows) for name, rows in sorted(by_name.items())}}
+
+
+def start_server(args, env):
+    if args.mode == 'asgi':
+        command = [sys.executable, '-m', 'uvicorn', '--workers', str(args.workers), '--port', str(args.port),
+                   '--no-access-log', 'asgi:app']
+    else:
+        # gunicorn 19.x не запускается через -m gunicorn
+        command = [sys.executable, '-c', 'from gunicorn.app.wsgiapp import run; run()', '-w', str(args.workers), '-b', '127.0.0.1:%d' % args.port, 'app:create_app()']
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            http.client.HTTPConnection('127.0.0.1', args.port, timeout=1).request('GET', '/metrics')
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError('%s server did not start' % args.mode)
+
+
+def print_report(result, baseline=None):
+    print('%-12s %8s %7s %9s %9s %9s %9s %7s' % ('endpoint', 'count', 'errors', 'rps', 'p50 ms', 'p95 ms', 'p99 ms', 'q/req'))
+    rows = list(result['endpoints'].items()) + [('TOTAL', result['total'])]
+    for name, stats in rows:
+        line = '%-12s %8d %7d %9.1f %9.2f %9.2f %9.2f %7s' % (
+            name, stats['count'], stats['errors'], stats['rps'],
+            stats['p50_ms'] or 0, stats['p95_ms'] or 0, stats['p99_ms'] or 0,
+            '%.1f' % stats['queries_per_request'] if stats['queries_per_request'] is not None else '-')
+        if baseline is not None:
+            old = baseline['total'] if name == 'TOTAL' else baseline['endpoints'].get(name)
+            if old and old['p95_ms'] and stats['p95_ms']:
+                line += '  p95 %+.0f%%' % ((stats['p95_ms'] / old['p95_ms'] - 1) * 100)
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--mode', choices=['inprocess', 'gunicorn', 'asgi'], default='inprocess')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn / uvicorn workers')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--database', help='SQLAlchemy URI; by default a fresh temporary SQLite file')
+    parser.add_argument('--no-seed', action='store_true', help='reuse an already seeded --database')
+    parser.add_argument('--mix', type=json.loads, default=DEFAULT_MIX, help='JSON {operation: weight}')
+    parser.add_argument('--output', help='results JSON path (default bench/results/<timestamp>.json)')
+    parser.add_argument('--compare', help='previous results JSON to compare p95 against')
+    args = parser.parse_args()
+
+    database = args.database or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'loadtest.db')
+    env = dict(os.environ, SQLALCHEMY_DATABASE_URI=database, LOGIN_RATE_LIMIT='1000000')
+    os.environ.update(env)
+    sys.path.insert(0, ROOT)
+
+    seed_seconds = None
+    if not args.no_seed:
+        seed_seconds = seed(args.products, args.users)
+        print('seeded %d products, %d users in %.1f s' % (args.products, args.users, seed_seconds))
+
+    server = None
+    if args.mode in ('gunicorn', 'asgi'):
+        server = start_server(args, env)
+        make_client = lambda: HttpClient('127.0.0.1', args.port)  # noqa: E731
+    else:
+        from app import app
+        make_client = lambda: InProcessClient(app)  # noqa: E731
+
+    samples = []
+    try:
+        deadline = time.perf_counter() + args.duration
+        started = time.perf_counter()
+        threads = [threading.Thread(target=run_worker, args=(make_client, number, args, args.mix, samples, deadline))
+                   for number in range(args.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    result = {
+        'started_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        'seed_seconds': seed_seconds,
+        'elapsed_seconds': elapsed,
+    }
+    result.update(summarize(samples, elapsed))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as source:
+            baseline = json.load(source)
+    print_report(result, baseline)
+
+    output = args.output or os.path.join(ROOT, 'bench', 'results', time.strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as target:
+        json.dump(result, target, indent=2)
+    print('results saved to', output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+# Потокобезопасный LRU-кэш с TTL и счётчиком версии.
+# bump() увеличивает версию и сбрасывает все записи; значение, загруженное
+# до bump(), в кэш уже не попадёт.
+class VersionedCache:
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            version, expires, value = entry
+            if version != self.version or expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, version=None):
+        with self._lock:
+            # Значение, прочитанное до bump(), не должно попасть в кэш
+            if version is not None and version != self.version:
+                return
+            self._data[key] = (self.version, time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_load(self, key, loader):
+        value = self.get(key)
+        if value is None:
+            version = self.version
+            value = loader()
+            if value is not None:
+                self.set(key, value, version)
+        return value
+
+    def bump(self):
+        with self._lock:
+            self.version += 1
+            self._data.clear()
@@ -0,0 +1,140 @@
+# Сводка каталога по категориям (таблица category_summary): число товаров,
+# число товаров со скидкой, минимальная и максимальная цена. Сводка не
+# пересчитывается по всему каталогу, а меняется на разницу при каждой записи
+# Product: вставка, удаление или изменение товара — пара запросов по
+# первичному ключу сводки. Мин./макс. ищутся заново, только когда из
+# категории ушёл товар с крайней ценой, — по индексу (category, price).
+# ORM-записи учитываются событиями ниже; Core-записи событий не вызывают,
+# поэтому import_catalog.py передаёт изменения в apply_changes сам.
+from sqlalchemy import bindparam, case, delete, event, func, insert, inspect, or_, select, update
+
+from database import dialect_insert
+from models import CategorySummary, Product
+
+NO_CATEGORY = ''  # Ключ сводки для товаров без категории
+TRACKED = ('category', 'price', 'discounted')
+
+
+def summary_key(category):
+    return category or NO_CATEGORY
+
+
+def summarize(rows):
+    # [(category, price, discounted), ...] -> {ключ: [товаров, со скидкой, мин., макс.]}
+    totals = {}
+    for category, price, discounted in rows:
+        key = summary_key(category)
+        if key not in totals:
+            totals[key] = [0, 0, price, price]
+        total = totals[key]
+        total[0] += 1
+        total[1] += 1 if discounted else 0
+        total[2] = min(total[2], price)
+        total[3] = max(total[3], price)
+    return totals
+
+
+def in_category(key):
+    product = Product.__table__
+    if key == NO_CATEGORY:
+        return or_(product.c.category.is_(None), product.c.category == NO_CATEGORY)
+    return product.c.category == bindparam('b_key')
+
+
+def extreme(fn, key):
+    return select(fn(Product.__table__.c.price)).where(in_category(key)).scalar_subquery()
+
+
+def apply_changes(connection, removed=(), added=()):
+    # removed — прежние (category, price, discounted) изменённых и удалённых
+    # товаров, added — новые значения вставленных и изменённых. Вызывается
+    # после записи в product, в той же транзакции.
+    table = CategorySummary.__table__
+    c = table.c
+    added, removed = summarize(added), summarize(removed)
+
+    if added:
+        statement = dialect_insert(connection.dialect.name, table)
+        excluded = statement.excluded
+        connection.execute(statement.on_conflict_do_update(index_elements=['category'], set_={
+            'product_count': c.product_count + excluded.product_count,
+            'discounted_count': c.discounted_count + excluded.discounted_count,
+            'min_price': case((excluded.min_price < c.min_price, excluded.min_price), else_=c.min_price),
+            'max_price': case((excluded.max_price > c.max_price, excluded.max_price), else_=c.max_price),
+        }), [{'category': key, 'product_count': count, 'discounted_count': discounted,
+              'min_price': min_price, 'max_price': max_price}
+             for key, (count, discounted, min_price, max_price) in added.items()])
+
+    if removed:
+        # Крайняя цена ищется заново, если ушедший товар её и держал
+        # (после вставки выше сводка уже учитывает новые цены)
+        for keys in ([key for key in removed if key != NO_CATEGORY],
+                     [key for key in removed if key == NO_CATEGORY]):
+            if not keys:
+                continue
+            connection.execute(
+                update(table).where(c.category == bindparam('b_key')).values(
+                    product_count=c.product_count - bindparam('b_count'),
+                    discounted_count=c.discounted_count - bindparam('b_discounted'),
+                    min_price=case((c.min_price >= bindparam('b_min'), extreme(func.min, keys[0])),
+                                   else_=c.min_price),
+                    max_price=case((c.max_price <= bindparam('b_max'), extreme(func.max, keys[0])),
+                                   else_=c.max_price),
+                ),
+                [{'b_key': key, 'b_count': removed[key][0], 'b_discounted': removed[key][1],
+                  'b_min': removed[key][2], 'b_max': removed[key][3]} for key in keys])
+        connection.execute(delete(table).where(c.category.in_(list(removed)), c.product_count <= 0))
+
+
+def rebuild(connection):
+    # Полный пересчёт сводки по product — для миграции и ручного исправления
+    table, product = CategorySummary.__table__, Product.__table__
+    key = func.coalesce(product.c.category, NO_CATEGORY)
+    connection.execute(delete(table))
+    connection.execute(insert(table).from_select(
+        ['category', 'product_count', 'discounted_count', 'min_price', 'max_price'],
+        select(key, func.count(), func.sum(case((product.c.discounted, 1), else_=0)),
+               func.min(product.c.price), func.max(product.c.price)).group_by(key)
+    ))
+
+
+def current_row(target):
+    return target.category, target.price, target.discounted
+
+
+def previous_row(target):
+    # Значения до изменения: в событиях маппера история атрибутов ещё не сброшена
+    state = inspect(target)
+    values = []
+    for name in TRACKED:
+        history = state.attrs[name].history
+        values.append(history.deleted[0] if history.deleted else getattr(target, name))
+    return tuple(values)
+
+
+def load_previous_value(target, value, oldvalue, initiator):
+    # Пустой слушатель ради active_history: при присваивании атрибуту
+    # истёкшего после commit объекта SQLAlchemy загрузит прежнее значение,
+    # иначе previous_row его не узнает
+    pass
+
+
+for name in TRACKED:
+    event.listen(getattr(Product, name), 'set', load_previous_value, active_history=True)
+
+
+@event.listens_for(Product, 'after_insert')
+def product_inserted(mapper, connection, target):
+    apply_changes(connection, added=[current_row(target)])
+
+
+@event.listens_for(Product, 'after_update')
+def product_updated(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in TRACKED):
+        apply_changes(connection, removed=[previous_row(target)], added=[current_row(target)])
+
+
+@event.listens_for(Product, 'after_delete')
+def product_deleted(mapper, connection, target):
+    apply_changes(connection, removed=[previous_row(target)])
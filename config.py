@@ -0,0 +1,44 @@
+import os
+from datetime import timedelta
+
+from database import database_uri
+
+
+def signing_keys(value):
+    # "kid1:secret1,kid2:secret2" -> {'kid1': 'secret1', 'kid2': 'secret2'}
+    return dict(item.split(':', 1) for item in value.split(',') if item)
+
+
+# Настройки по умолчанию; create_app(config) переопределяет любые из них
+class Config:
+    JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'super-secret')  # Ключ токенов без kid (замените на свой)
+    # Ротация ключей: новые токены подписываются ключом JWT_SIGNING_KEY_ID
+    # и несут его в заголовке kid, проверяются ключом из своего kid. Старый
+    # ключ убирают из JWT_SIGNING_KEYS, когда истекут подписанные им токены.
+    JWT_SIGNING_KEYS = signing_keys(os.environ.get('JWT_SIGNING_KEYS', ''))  # "kid1:secret1,kid2:secret2"
+    JWT_SIGNING_KEY_ID = os.environ.get('JWT_SIGNING_KEY_ID')  # None — подписывать JWT_SECRET_KEY без kid
+    JWT_ACCESS_TOKEN_EXPIRES = timedelta(minutes=15)
+    JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)
+    JWT_DENYLIST_SYNC_INTERVAL = 1.0  # Как часто подтягивать отзывы токенов из БД, сек
+    JWT_VERIFIED_TOKEN_CACHE_SIZE = 10000  # Сколько проверенных токенов помнить (не проверять подпись повторно)
+    JWT_VERIFIED_TOKEN_CACHE_TTL = 60  # Сколько помнить проверенный токен, сек (не дольше его exp)
+    SQLALCHEMY_DATABASE_URI = database_uri()  # По умолчанию SQLite, см. database.py
+    # SQLALCHEMY_ENGINE_OPTIONS, если не заданы, строятся по URI в create_app
+    CATALOG_CACHE_SIZE = 1024  # Кол-во страниц/товаров в кэше каталога
+    CATALOG_CACHE_TTL = 300  # Время жизни записи кэша каталога, сек
+    CATALOG_SNAPSHOT_PATH = os.environ.get('CATALOG_SNAPSHOT_PATH')  # Общий снимок для /products/<id>, см. snapshot.py (None — выключен)
+    CATALOG_SNAPSHOT_CHECK_INTERVAL = 1.0  # Как часто проверять, не пересобран ли снимок, сек
+    USER_CACHE_TTL = 60  # Время жизни пользователя в кэше авторизации, сек
+    PROPAGATE_EXCEPTIONS = True  # Иначе Flask-RESTful превращает ошибки JWT в 500
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:260000'  # Алгоритм и стоимость хэша паролей
+    PASSWORD_HASH_WORKERS = 4  # Потоков для хэширования паролей
+    PASSWORD_HASH_QUEUE = 64  # Сколько хэширований может ждать в очереди
+    LOGIN_RATE_LIMIT = int(os.environ.get('LOGIN_RATE_LIMIT', 10))  # Попыток входа на имя пользователя / IP ...
+    LOGIN_RATE_PERIOD = 60  # ... за столько секунд
+    PRICING_CATEGORY_PROMOTIONS = {}  # {категория: % скидки}
+    PRICING_QUANTITY_TIERS = []  # [(от N штук, % скидки), ...]
+    PRICING_STACK_DISCOUNTS = True  # Суммировать скидки или брать лучшую
+    STOCK_RESERVATION_TTL = 900  # Сколько корзина держит товар, сек
+    JOB_MAX_ATTEMPTS = 5  # Попыток фоновой задачи до статуса dead
+    JOB_RETRY_DELAY = 5  # Задержка перед повтором, сек (удваивается)
+    JOB_DONE_RETENTION = 86400  # Сколько хранить выполненные задачи, сек
@@ -0,0 +1,87 @@
+import os
+import sqlite3
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+
+DEFAULT_DATABASE_URI = 'sqlite:///myapp.db'
+
+
+def database_uri(environ=os.environ):
+    return environ.get('SQLALCHEMY_DATABASE_URI') or environ.get('DATABASE_URL') or DEFAULT_DATABASE_URI
+
+
+def engine_options(uri, environ=os.environ):
+    # Параметры пула из окружения. Для SQLite в памяти пул не настраивается:
+    # там используется одно соединение на поток.
+    url = make_url(uri)
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        return {}
+    options = dict(
+        pool_size=int(environ.get('DB_POOL_SIZE', 5)),
+        max_overflow=int(environ.get('DB_MAX_OVERFLOW', 10)),
+        pool_recycle=int(environ.get('DB_POOL_RECYCLE', 1800)),
+        pool_timeout=int(environ.get('DB_POOL_TIMEOUT', 30)),
+    )
+    if url.get_backend_name() != 'sqlite':
+        # Серверные БД рвут простаивающие соединения
+        options['pool_pre_ping'] = True
+    elif url.get_driver_name() == 'aiosqlite':
+        # aiosqlite по умолчанию открывает соединение (и поток) на каждый запрос
+        from sqlalchemy.pool import AsyncAdaptedQueuePool
+        options['poolclass'] = AsyncAdaptedQueuePool
+    return options
+
+
+def sqlite_pragmas(environ=os.environ):
+    # WAL позволяет читать во время записи, busy_timeout заставляет писателя
+    # ждать блокировку вместо немедленного "database is locked"
+    return {
+        'journal_mode': environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'busy_timeout': int(environ.get('SQLITE_BUSY_TIMEOUT', 5000)),
+        'mmap_size': int(environ.get('SQLITE_MMAP_SIZE', 268435456)),
+    }
+
+
+def is_sqlite_connection(dbapi_connection):
+    # sqlite3 или адаптер aiosqlite из SQLAlchemy (асинхронный движок asgi.py)
+    return isinstance(dbapi_connection, sqlite3.Connection) \
+        or type(dbapi_connection).__name__ == 'AsyncAdapt_aiosqlite_connection'
+
+
+def async_database_uri(uri):
+    # Тот же адрес БД для асинхронного драйвера: sqlite:///x.db ->
+    # sqlite+aiosqlite:///x.db, postgresql://... -> postgresql+asyncpg://...
+    url = make_url(uri)
+    drivers = {'sqlite': 'aiosqlite', 'postgresql': 'asyncpg'}
+    backend = url.get_backend_name()
+    if backend not in drivers:
+        raise ValueError('No async driver configured for %s' % backend)
+    return url.set(drivername='%s+%s' % (backend, drivers[backend])).render_as_string(hide_password=False)
+
+
+def install_sqlite_pragmas(pragmas, target=Engine):
+    # target — конкретный Engine приложения или класс Engine (все движки)
+    @event.listens_for(target, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        if not is_sqlite_connection(dbapi_connection):
+            return
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute('PRAGMA %s = %s' % (name, value))
+        cursor.close()
+
+    return set_sqlite_pragmas
+
+
+def dialect_insert(dialect_name, table):
+    # INSERT с поддержкой ON CONFLICT для SQLite и PostgreSQL. Диалекты
+    # импортируются здесь: модуль postgresql заметно удлиняет запуск
+    if dialect_name == 'sqlite':
+        from sqlalchemy.dialects import sqlite
+        return sqlite.insert(table)
+    if dialect_name == 'postgresql':
+        from sqlalchemy.dialects import postgresql
+        return postgresql.insert(table)
+    raise ValueError('Upsert is not supported for %s' % dialect_name)
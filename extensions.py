@@ -0,0 +1,62 @@
+# Расширения и общие объекты приложения. Создаются без приложения и
+# привязываются к нему в init_app, поэтому модули импортируют их напрямую,
+# а каждое приложение из create_app (например, в тестах) получает свои
+# кэши, пулы и настройки. Обращаться к ним можно только в контексте
+# приложения, как к current_app.
+from flask import current_app
+from flask_sqlalchemy import SQLAlchemy
+from werkzeug.local import LocalProxy
+
+from cache import VersionedCache
+from jobs import JobQueue
+from pricing import PricingRules
+from security import CachingJWTManager, Denylist, PasswordHasher, RateLimiter
+from snapshot import CatalogSnapshot
+
+db = SQLAlchemy()
+jwt = CachingJWTManager()
+
+
+def app_state(name):
+    return LocalProxy(lambda: current_app.extensions['shop'][name])
+
+
+catalog_cache = app_state('catalog_cache')
+catalog_snapshot = app_state('catalog_snapshot')
+user_cache = app_state('user_cache')
+password_hasher = app_state('password_hasher')
+login_limiter = app_state('login_limiter')
+pricing_rules = app_state('pricing_rules')
+job_queue = app_state('job_queue')
+denylist = app_state('denylist')
+
+
+def init_app(app):
+    from models import Job, RevokedToken  # models сам импортирует db отсюда
+
+    config = app.config
+    db.init_app(app)
+    jwt.init_app(app)
+    app.extensions['shop'] = {
+        # Кэш сериализованного каталога внутри процесса. Сбрасывается при
+        # любом изменении Product через ORM; изменения из других процессов
+        # видны после истечения TTL.
+        'catalog_cache': VersionedCache(config['CATALOG_CACHE_SIZE'], config['CATALOG_CACHE_TTL']),
+        # Снимок каталога в файле, общий для всех процессов (snapshot.py)
+        'catalog_snapshot': CatalogSnapshot(config['CATALOG_SNAPSHOT_PATH'],
+                                            config['CATALOG_SNAPSHOT_CHECK_INTERVAL']),
+        'user_cache': VersionedCache(10000, config['USER_CACHE_TTL']),
+        'token_cache': VersionedCache(config['JWT_VERIFIED_TOKEN_CACHE_SIZE'],
+                                      config['JWT_VERIFIED_TOKEN_CACHE_TTL']),
+        'password_hasher': PasswordHasher(config['PASSWORD_HASH_METHOD'],
+                                          config['PASSWORD_HASH_WORKERS'],
+                                          config['PASSWORD_HASH_QUEUE']),
+        'login_limiter': RateLimiter(config['LOGIN_RATE_LIMIT'], config['LOGIN_RATE_PERIOD']),
+        'pricing_rules': PricingRules(config['PRICING_CATEGORY_PROMOTIONS'],
+                                      config['PRICING_QUANTITY_TIERS'],
+                                      config['PRICING_STACK_DISCOUNTS']),
+        # Фоновые задачи; обработчики регистрируются в worker.py
+        'job_queue': JobQueue(Job, config['JOB_MAX_ATTEMPTS'], config['JOB_RETRY_DELAY'],
+                              done_retention=config['JOB_DONE_RETENTION']),
+        'denylist': Denylist(RevokedToken, config['JWT_DENYLIST_SYNC_INTERVAL']),
+    }
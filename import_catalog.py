@@ -0,0 +1,172 @@
+# Потоковый импорт каталога товаров из CSV или JSONL.
+# Файл читается построчно и пишется пачками через INSERT ... ON CONFLICT
+# (id) DO UPDATE, поэтому память не растёт с размером файла, а повторный
+# запуск обновляет уже существующие товары.
+#
+#   python import_catalog.py products.csv
+#   python import_catalog.py feed.jsonl --chunk-size 20000
+#
+# Импорт идёт в отдельном процессе, поэтому запущенное приложение отдаёт
+# из своего кэша каталога прежние страницы, товары и /categories, пока не
+# истечёт CATALOG_CACHE_TTL (по умолчанию 300 с). /products/<id> при
+# включённом снимке (snapshot.py) обновится, как только воркер его пересоберёт.
+#
+# Колонки: id, name, category, price, discounted, discount_type,
+# discount_amount, stock (пустой stock не меняет текущий остаток).
+# В JSONL скидка может быть и вложенной, как в ответе /products:
+# "discount": {"type": ..., "amount": ...}.
+import argparse
+import csv
+import itertools
+import json
+import sys
+import time
+
+from sqlalchemy import func, insert, select
+
+from app import create_app
+from categories import apply_changes
+from database import dialect_insert
+from extensions import catalog_snapshot, db, job_queue
+from models import Product
+
+COLUMNS = ('id', 'name', 'category', 'price', 'discounted', 'discount_type', 'discount_amount', 'stock')
+TRUE_VALUES = ('1', 'true', 'yes', 'y', 't')
+
+
+def read_csv(source):
+    for row in csv.DictReader(source):
+        yield row
+
+
+def read_jsonl(source):
+    for line in source:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def normalize(row):
+    discount = row.get('discount') or {}
+    discount_type = row.get('discount_type') or discount.get('type') or None
+    discount_amount = row.get('discount_amount')
+    if discount_amount in (None, ''):
+        discount_amount = discount.get('amount')
+    discounted = row.get('discounted')
+    if isinstance(discounted, str):
+        discounted = discounted.strip().lower() in TRUE_VALUES
+    elif discounted is None:
+        discounted = discount_type is not None
+
+    if not row.get('name'):
+        raise ValueError('name is required')
+    return {
+        'id': int(row['id']) if row.get('id') not in (None, '') else None,
+        'name': row['name'],
+        'category': row.get('category') or None,
+        'price': float(row['price']),
+        'discounted': bool(discounted),
+        'discount_type': discount_type,
+        'discount_amount': float(discount_amount) if discount_amount not in (None, '') else None,
+        'stock': int(row['stock']) if row.get('stock') not in (None, '') else None,
+    }
+
+
+def upsert_statement(dialect_name):
+    statement = dialect_insert(dialect_name, Product.__table__)
+    values = {column: statement.excluded[column] for column in COLUMNS if column not in ('id', 'stock')}
+    values['stock'] = func.coalesce(statement.excluded.stock, Product.__table__.c.stock)
+    return statement.on_conflict_do_update(index_elements=['id'], set_=values)
+
+
+def write_chunk(connection, rows, upsert):
+    # Строки с id — upsert одним executemany, без id — обычная вставка.
+    # Повтор id в пачке схлопывается в последнюю строку, как при поочерёдной
+    # записи (пустой stock не затирает остаток из более ранней строки):
+    # PostgreSQL отправляет executemany одним многострочным INSERT, а
+    # ON CONFLICT не может изменить одну строку дважды
+    latest = {}
+    for row in rows:
+        if row['id'] is None:
+            continue
+        earlier = latest.get(row['id'])
+        if earlier is not None and row['stock'] is None:
+            row = dict(row, stock=earlier['stock'])
+        latest[row['id']] = row
+    with_id = list(latest.values())
+    without_id = [{key: value for key, value in row.items() if key != 'id'} for row in rows if row['id'] is None]
+    table = Product.__table__
+    # Прежние значения обновляемых товаров — для сводки по категориям
+    previous = connection.execute(
+        select(table.c.category, table.c.price, table.c.discounted)
+        .where(table.c.id.in_([row['id'] for row in with_id]))
+    ).all() if with_id else []
+    if with_id:
+        connection.execute(upsert, with_id)
+    if without_id:
+        connection.execute(insert(table), without_id)
+    written = with_id + without_id
+    apply_changes(connection, removed=previous,
+                  added=[(row['category'], row['price'], row['discounted']) for row in written])
+
+
+def import_rows(rows, chunk_size=5000, log=sys.stderr, max_errors_shown=10):
+    # rows — итератор сырых словарей; возвращает (записано, пропущено, сек)
+    started = reported = time.perf_counter()
+    written = skipped = 0
+
+    def valid_rows():
+        nonlocal skipped
+        for number, row in enumerate(rows, 1):
+            try:
+                yield normalize(row)
+            except (KeyError, TypeError, ValueError) as exc:
+                skipped += 1
+                if skipped <= max_errors_shown:
+                    print('row %d skipped: %s' % (number, exc), file=log)
+
+    valid = valid_rows()
+    upsert = upsert_statement(db.engine.dialect.name)
+    while True:
+        chunk = list(itertools.islice(valid, chunk_size))
+        if not chunk:
+            break
+        with db.engine.begin() as connection:
+            write_chunk(connection, chunk, upsert)
+        written += len(chunk)
+        now = time.perf_counter()
+        if now - reported >= 1:
+            reported = now
+            print('%d rows, %.0f rows/s' % (written, written / (now - started)), file=log)
+
+    # Core-вставки не вызывают ORM-события Product: сводку по категориям
+    # обновляет write_chunk, снимок пересоберёт воркер. Кэш каталога живёт
+    # в процессах приложения, отсюда его не сбросить (см. заголовок файла)
+    if catalog_snapshot.enabled and written:
+        job_queue.enqueue(db.session, 'catalog_snapshot', {})
+        db.session.commit()
+    return written, skipped, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('path', help='CSV or JSONL file, "-" for stdin')
+    parser.add_argument('--format', choices=['csv', 'jsonl'], help='default: by file extension')
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    file_format = args.format or ('csv' if args.path.endswith('.csv') else 'jsonl')
+    reader = read_csv if file_format == 'csv' else read_jsonl
+    source = sys.stdin if args.path == '-' else open(args.path, newline='', encoding='utf-8')
+    try:
+        with create_app().app_context():
+            written, skipped, elapsed = import_rows(reader(source), args.chunk_size)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+    print('Imported %d products (%d skipped) in %.1f s, %.0f rows/s'
+          % (written, skipped, elapsed, written / elapsed if elapsed else 0))
+
+
+if __name__ == '__main__':
+    main()
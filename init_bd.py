@@ -1,35 +1,19 @@
-from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
+from app import create_app
+from import_catalog import import_rows
+from migrations import upgrade
 
-app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///myapp.db'  # Укажите путь к вашей базе данных
-db = SQLAlchemy(app)
-
-class Product(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(80), nullable=False)
-    category = db.Column(db.String(80))
-    price = db.Column(db.Float, nullable=False)
-    discounted = db.Column(db.Boolean, default=False)
-    discount_type = db.Column(db.String(80))
-    discount_amount = db.Column(db.Float)
+# Демонстрационный каталог. Запись идёт через upsert по id, поэтому скрипт
+# можно запускать повторно; большие каталоги грузите через import_catalog.py
+products = [
+    {'id': 1, 'name': 'HP Pavilion Laptop', 'category': 'Electronics', 'price': 10.99, 'discounted': True, 'discount_type': 'Percentage', 'discount_amount': 10},
+    {'id': 2, 'name': 'Samsung Galaxy Smartphone', 'category': 'Electronics', 'price': 15.99, 'discounted': False},
+    {'id': 3, 'name': 'Adidas T-shirt', 'category': 'Clothing', 'price': 8.99, 'discounted': True, 'discount_type': 'Fixed', 'discount_amount': 2.50},
+    {'id': 4, 'name': 'Levis Jeans', 'category': 'Clothing', 'price': 12.99, 'discounted': True, 'discount_type': 'Percentage', 'discount_amount': 15},
+]
 
 if __name__ == '__main__':
-    with app.app_context():
-        db.create_all()
-
-    # Генерация 5 продуктов
-    products = [
-        Product(id=1, name='HP Pavilion Laptop', category='Electronics', price=10.99, discounted=True, discount_type='Percentage', discount_amount=10),
-        Product(id=2, name='Samsung Galaxy Smartphone', category='Electronics', price=15.99, discounted=False),
-        Product(id=3, name='Adidas T-shirt', category='Clothing', price=8.99, discounted=True, discount_type='Fixed', discount_amount=2.50),
-        Product(id=4, name='Levis Jeans', category='Clothing', price=12.99, discounted=True, discount_type='Percentage', discount_amount=15)
-    ]
-
-    # Добавление продуктов в базу данных
-    with app.app_context():
-        for product in products:
-            db.session.add(product)
-        db.session.commit()
+    with create_app().app_context():
+        upgrade()
+        written, skipped, elapsed = import_rows(products)
 
-    print("5 products have been generated and added to the database.")
+    print("%d products have been generated and added to the database." % written)
@@ -0,0 +1,132 @@
+# Очередь фоновых задач в таблице БД (без внешнего брокера).
+# Задача ставится в той же транзакции, что и данные, которые она
+# обрабатывает (transactional outbox): не видна воркерам до commit и не
+# теряется при падении процесса после него. Воркеры забирают задачи
+# атомарным UPDATE, при ошибке задача повторяется с экспоненциальной
+# задержкой, после max_attempts попыток переходит в статус dead.
+import json
+import time
+import traceback
+
+from sqlalchemy import delete, select, update
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+DEAD = 'dead'
+
+# Обработчики по типу задачи, общие для всех очередей процесса:
+# регистрируются при импорте модуля, до создания приложения
+handlers = {}
+
+
+def handler(kind):
+    def register(fn):
+        handlers[kind] = fn
+        return fn
+    return register
+
+
+class JobQueue:
+    def __init__(self, model, max_attempts=5, retry_delay=5, visibility_timeout=300, done_retention=86400,
+                 handlers=handlers):
+        self.model = model
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.visibility_timeout = visibility_timeout
+        self.done_retention = done_retention
+        self.handlers = handlers
+
+    def enqueue(self, session, kind, payload, delay=0):
+        # Только добавляет строку; фиксирует вызывающий код вместе со своими данными
+        now = time.time()
+        session.add(self.model(kind=kind, payload=json.dumps(payload), status=PENDING, attempts=0,
+                               max_attempts=self.max_attempts, run_at=now + delay, created_at=now))
+
+    def claim(self, session):
+        # Забирает одну готовую задачу. Условие status = pending во внешнем
+        # UPDATE не даёт двум воркерам взять одну и ту же задачу. В SQLite
+        # запись сериализована; в PostgreSQL параллельные воркеры выбрали бы
+        # одну и ту же строку, и проигравший остался бы ни с чем при полной
+        # очереди, поэтому там строка блокируется, а занятые пропускаются.
+        job = self.model
+        now = time.time()
+        next_id = select(job.id) \
+            .where(job.status == PENDING, job.run_at <= now) \
+            .order_by(job.run_at, job.id) \
+            .limit(1)
+        if session.get_bind().dialect.name == 'postgresql':
+            next_id = next_id.with_for_update(skip_locked=True)
+        row = session.execute(
+            update(job)
+            .where(job.id == next_id.scalar_subquery(), job.status == PENDING)
+            .values(status=RUNNING, locked_at=now, attempts=job.attempts + 1)
+            .returning(job.id, job.kind, job.payload, job.attempts, job.max_attempts)
+        ).first()
+        session.commit()
+        return row
+
+    def complete(self, session, job_id):
+        session.execute(update(self.model).where(self.model.id == job_id).values(status=DONE, last_error=None))
+        session.commit()
+
+    def absorb(self, session, kind):
+        # Отмечает выполненными ожидающие задачи kind, которые покроет
+        # выполняемая сейчас задача того же типа (например, полная
+        # пересборка). Фиксируется до начала работы: всё, что поставлено
+        # в очередь позже, будет видно ей или выполнится следующей задачей.
+        job = self.model
+        result = session.execute(
+            update(job)
+            .where(job.kind == kind, job.status == PENDING, job.run_at <= time.time())
+            .values(status=DONE)
+        )
+        session.commit()
+        return result.rowcount
+
+    def fail(self, session, row, error):
+        if row.attempts >= row.max_attempts:
+            values = {'status': DEAD}
+        else:
+            values = {'status': PENDING, 'run_at': time.time() + self.retry_delay * 2 ** (row.attempts - 1)}
+        values['last_error'] = error[-4000:]
+        session.execute(update(self.model).where(self.model.id == row.id).values(**values))
+        session.commit()
+
+    def requeue_stale(self, session):
+        # Задачи, чей воркер умер посреди выполнения, возвращаются в очередь
+        job = self.model
+        result = session.execute(
+            update(job)
+            .where(job.status == RUNNING, job.locked_at < time.time() - self.visibility_timeout)
+            .values(status=PENDING)
+        )
+        session.commit()
+        return result.rowcount
+
+    def purge(self, session):
+        # Удаляет выполненные задачи старше done_retention секунд (их копит,
+        # например, catalog_snapshot). Dead-задачи остаются для разбора.
+        job = self.model
+        result = session.execute(
+            delete(job).where(job.status == DONE, job.run_at < time.time() - self.done_retention)
+        )
+        session.commit()
+        return result.rowcount
+
+    def run_one(self, session):
+        # Выполняет одну задачу; False — если очередь пуста
+        row = self.claim(session)
+        if row is None:
+            return False
+        try:
+            handler = self.handlers.get(row.kind)
+            if handler is None:
+                raise LookupError('No handler for job kind %r' % row.kind)
+            handler(json.loads(row.payload))
+        except Exception:
+            session.rollback()
+            self.fail(session, row, traceback.format_exc())
+        else:
+            self.complete(session, row.id)
+        return True
@@ -0,0 +1,146 @@
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.count += 1
+        self.sum += value
+
+
+# Метрики запросов внутри процесса: время ответа, число SQL-запросов, время
+# в БД и на сериализацию JSON — по каждому маршруту. Отдаются на /metrics в
+# текстовом формате Prometheus. Заголовок запроса X-Debug-Timing добавляет
+# в ответ разбивку времени для этого запроса.
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = defaultdict(int)  # (route, method, status) -> кол-во
+        self.latency = defaultdict(Histogram)  # route -> Histogram
+        self.db_latency = defaultdict(Histogram)
+        self.serialization = defaultdict(float)  # route -> сек
+        self.statements = defaultdict(int)  # route -> кол-во SQL
+
+    def init_app(self, app, apis=()):
+        # Метрики общие на процесс, даже если приложений несколько (create_app
+        # в тестах): обработчики Engine и представлений Api ставятся один раз
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.add_url_rule('/metrics', 'metrics', self.export)
+        if not event.contains(Engine, 'before_cursor_execute', self._before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+        for api in apis:
+            self._wrap_representations(api)
+
+    def _wrap_representations(self, api):
+        if getattr(api, 'timed_by_metrics', False):
+            return
+        api.timed_by_metrics = True
+        for mediatype, output in list(api.representations.items()):
+            def timed_output(data, code, headers=None, output=output):
+                with self.timed_serialization():
+                    return output(data, code, headers)
+            api.representations[mediatype] = timed_output
+
+    @staticmethod
+    def _start_request():
+        g.request_timing = {'started': time.perf_counter(), 'statements': 0, 'db': 0.0, 'serialize': 0.0}
+
+    def _finish_request(self, response):
+        timing = g.pop('request_timing', None)
+        if timing is None:
+            return response
+        elapsed = time.perf_counter() - timing['started']
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        if route == '/metrics':
+            return response
+        with self._lock:
+            self.requests[(route, request.method, response.status_code)] += 1
+            self.latency[route].observe(elapsed)
+            self.db_latency[route].observe(timing['db'])
+            self.serialization[route] += timing['serialize']
+            self.statements[route] += timing['statements']
+        if request.headers.get('X-Debug-Timing'):
+            response.headers['X-Debug-Timing'] = (
+                'total;dur=%.3f, db;dur=%.3f;count=%d, serialize;dur=%.3f'
+                % (elapsed * 1000, timing['db'] * 1000, timing['statements'], timing['serialize'] * 1000))
+        return response
+
+    @staticmethod
+    def _current_timing():
+        if has_request_context():
+            return g.get('request_timing')
+        return None
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self._current_timing() is not None:
+            conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        timing = self._current_timing()
+        started = conn.info.get('query_started')
+        if timing is None or not started:
+            return
+        timing['statements'] += 1
+        timing['db'] += time.perf_counter() - started.pop()
+
+    @contextmanager
+    def timed_serialization(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            timing = self._current_timing()
+            if timing is not None:
+                timing['serialize'] += time.perf_counter() - started
+
+    def export(self):
+        lines = []
+        with self._lock:
+            lines.append('# TYPE http_requests_total counter')
+            for (route, method, status), count in sorted(self.requests.items()):
+                lines.append('http_requests_total{route="%s",method="%s",status="%d"} %d'
+                             % (route, method, status, count))
+            self._export_histogram(lines, 'http_request_duration_seconds', self.latency)
+            self._export_histogram(lines, 'db_request_duration_seconds', self.db_latency)
+            lines.append('# TYPE db_statements_total counter')
+            for route, count in sorted(self.statements.items()):
+                lines.append('db_statements_total{route="%s"} %d' % (route, count))
+            lines.append('# TYPE json_serialization_seconds_total counter')
+            for route, seconds in sorted(self.serialization.items()):
+                lines.append('json_serialization_seconds_total{route="%s"} %.6f' % (route, seconds))
+        return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+    @staticmethod
+    def _export_histogram(lines, name, histograms):
+        lines.append('# TYPE %s histogram' % name)
+        for route, histogram in sorted(histograms.items()):
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append('%s_bucket{route="%s",le="%s"} %d' % (name, route, bound, cumulative))
+            lines.append('%s_bucket{route="%s",le="+Inf"} %d' % (name, route, histogram.count))
+            lines.append('%s_sum{route="%s"} %.6f' % (name, route, histogram.sum))
+            lines.append('%s_count{route="%s"} %d' % (name, route, histogram.count))
+
+
+metrics = Metrics()
@@ -0,0 +1,275 @@
+# Версионированные изменения схемы БД. Приложение схему не трогает:
+# миграции применяются один раз при развёртывании, до запуска воркеров,
+#   flask --app app migrate
+#   python migrations.py
+# Номер последней применённой миграции хранится в schema_version.
+# Новое изменение схемы — новая функция с @migration(следующий номер),
+# уже выпущенные миграции не редактируются.
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import (Boolean, Column, Float, ForeignKey, Index, Integer, MetaData, String, Table, Text,
+                        UniqueConstraint, case, column, delete, func, insert, inspect, select, table, text,
+                        update)
+
+from extensions import db
+from search import install_fts, search_supported
+
+MIGRATIONS = []
+
+
+def migration(version):
+    def register(fn):
+        MIGRATIONS.append((version, fn))
+        return fn
+    return register
+
+
+def current_version(connection):
+    connection.execute(text('CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)'))
+    return connection.execute(text('SELECT MAX(version) FROM schema_version')).scalar() or 0
+
+
+def upgrade(engine=None):
+    # Применяет недостающие миграции, каждую в своей транзакции.
+    # Возвращает список применённых версий.
+    engine = engine or db.engine
+    applied = []
+    for version, fn in sorted(MIGRATIONS, key=lambda item: item[0]):
+        with engine.begin() as connection:
+            if version <= current_version(connection):
+                continue
+            fn(connection)
+            connection.execute(text('INSERT INTO schema_version (version) VALUES (:version)'), {'version': version})
+        applied.append(version)
+    return applied
+
+
+def quote(connection, name):
+    return connection.dialect.identifier_preparer.quote(name)
+
+
+def column_ddl(connection, column):
+    ddl = '%s %s' % (quote(connection, column.name), column.type.compile(connection.dialect))
+    if not column.nullable:
+        # SQLite не добавляет NOT NULL колонку без значения по умолчанию
+        default = column.default.arg if column.default is not None and column.default.is_scalar else 0
+        ddl += ' NOT NULL DEFAULT %r' % default
+    return ddl
+
+
+def add_column(connection, table_name, column):
+    # Добавляет колонку, если её ещё нет
+    if column.name in {existing['name'] for existing in inspect(connection).get_columns(table_name)}:
+        return
+    connection.execute(text('ALTER TABLE %s ADD COLUMN %s'
+                            % (quote(connection, table_name), column_ddl(connection, column))))
+
+
+def create_index(connection, name, table_name, columns):
+    connection.execute(text('CREATE INDEX IF NOT EXISTS %s ON %s (%s)' % (
+        quote(connection, name), quote(connection, table_name),
+        ', '.join(quote(connection, column) for column in columns))))
+
+
+def has_unique(inspector, table, columns):
+    existing = [constraint['column_names'] for constraint in inspector.get_unique_constraints(table)]
+    existing += [index['column_names'] for index in inspector.get_indexes(table) if index['unique']]
+    return list(columns) in existing
+
+
+# Схема на момент миграции 1. Миграции не читают текущие модели: иначе
+# новая база сразу получила бы их последнюю версию, и следующие миграции
+# проверялись бы только на старых базах. Изменения моделей — новыми миграциями.
+INITIAL_SCHEMA = MetaData()
+
+Table('user', INITIAL_SCHEMA,
+      Column('id', Integer, primary_key=True),
+      Column('username', String, unique=True, nullable=False),
+      Column('password', String, nullable=False))
+
+Table('product', INITIAL_SCHEMA,
+      Column('id', Integer, primary_key=True),
+      Column('name', String(80), nullable=False),
+      Column('category', String(80)),
+      Column('price', Float, nullable=False),
+      Column('discounted', Boolean, default=False),
+      Column('discount_type', String(80)),
+      Column('discount_amount', Float),
+      Column('stock', Integer),
+      Index('ix_product_category_id', 'category', 'id'),
+      Index('ix_product_discounted_id', 'discounted', 'id'),
+      Index('ix_product_price', 'price'))
+
+Table('cart', INITIAL_SCHEMA,
+      Column('id', Integer, primary_key=True),
+      Column('user_id', Integer, ForeignKey('user.id'), nullable=False, unique=True),
+      Column('total_price', Float, nullable=False),
+      Column('total_discount', Float, nullable=False))
+
+Table('order', INITIAL_SCHEMA,
+      Column('id', Integer, primary_key=True),
+      Column('user_id', Integer, ForeignKey('user.id'), nullable=False),
+      Column('total_price', Float, nullable=False),
+      Column('idempotency_key', String(64)),
+      UniqueConstraint('user_id', 'idempotency_key', name='uq_order_user_idempotency_key'))
+
+Table('order_item', INITIAL_SCHEMA,
+      Column('id', Integer, primary_key=True),
+      Column('order_id', Integer, ForeignKey('order.id'), nullable=False, index=True),
+      Column('product_id', Integer, ForeignKey('product.id'), nullable=False),
+      Column('price', Float, nullable=False),
+      Column('quantity', Integer, nullable=False, default=1))
+
+Table('cart_item', INITIAL_SCHEMA,
+      Column('id', Integer, primary_key=True),
+      Column('user_id', Integer, ForeignKey('user.id'), nullable=False),
+      Column('product_id', Integer, ForeignKey('product.id'), nullable=False),
+      Column('cart_id', Integer, ForeignKey('cart.id'), nullable=False),
+      Column('quantity', Integer, nullable=False, default=1),
+      Column('line_total', Float, nullable=False, default=0),
+      Column('line_discount', Float, nullable=False, default=0),
+      UniqueConstraint('user_id', 'product_id', name='uq_cart_item_user_product'))
+
+Table('stock_reservation', INITIAL_SCHEMA,
+      Column('id', Integer, primary_key=True),
+      Column('user_id', Integer, ForeignKey('user.id'), nullable=False),
+      Column('product_id', Integer, ForeignKey('product.id'), nullable=False),
+      Column('quantity', Integer, nullable=False),
+      Column('expires_at', Float, nullable=False),
+      UniqueConstraint('user_id', 'product_id', name='uq_stock_reservation_user_product'),
+      Index('ix_stock_reservation_expires_at', 'expires_at'))
+
+Table('job', INITIAL_SCHEMA,
+      Column('id', Integer, primary_key=True),
+      Column('kind', String(80), nullable=False),
+      Column('payload', Text, nullable=False),
+      Column('status', String(16), nullable=False),
+      Column('attempts', Integer, nullable=False, default=0),
+      Column('max_attempts', Integer, nullable=False),
+      Column('run_at', Float, nullable=False),
+      Column('locked_at', Float),
+      Column('created_at', Float, nullable=False),
+      Column('last_error', Text),
+      Index('ix_job_status_run_at', 'status', 'run_at'))
+
+
+@migration(1)
+def initial_schema(connection):
+    # Базы, созданные раньше через create_all при импорте app.py, получают
+    # колонки, индексы и уникальные ключи, которые create_all не добавляет
+    # в уже существующие таблицы.
+    inspector = inspect(connection)
+    existing_tables = set(inspector.get_table_names())
+    INITIAL_SCHEMA.create_all(connection)
+    for table in INITIAL_SCHEMA.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        for column in table.columns:
+            add_column(connection, table.name, column)
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+        for constraint in table.constraints:
+            if isinstance(constraint, UniqueConstraint) and not has_unique(inspector, table.name, constraint.columns.keys()):
+                name = constraint.name or 'uq_%s_%s' % (table.name, '_'.join(constraint.columns.keys()))
+                connection.execute(text('CREATE UNIQUE INDEX %s ON %s (%s)' % (
+                    quote(connection, name), quote(connection, table.name),
+                    ', '.join(quote(connection, column) for column in constraint.columns.keys()))))
+    install_fts(connection)
+
+
+@migration(2)
+def revoked_tokens(connection):
+    Table('revoked_token', MetaData(),
+          Column('id', Integer, primary_key=True),
+          Column('jti', String(36), nullable=False, unique=True),
+          Column('expires_at', Float, nullable=False, index=True)).create(connection, checkfirst=True)
+
+
+@migration(3)
+def order_history(connection):
+    # Снимок товара в позициях заказа и индексы для постраничной истории.
+    # Позиции старых заказов заполняются из текущих данных товара.
+    add_column(connection, 'order', Column('created_at', Float))
+    snapshot = (Column('name', String(80)), Column('category', String(80)), Column('discounted', Boolean),
+                Column('discount_type', String(80)), Column('discount_amount', Float))
+    for snapshot_column in snapshot:
+        add_column(connection, 'order_item', snapshot_column)
+    connection.execute(text('DROP INDEX IF EXISTS ix_order_item_order_id'))
+    create_index(connection, 'ix_order_user_id_id', 'order', ['user_id', 'id'])
+    create_index(connection, 'ix_order_item_order_id_id', 'order_item', ['order_id', 'id'])
+
+    names = ('name', 'category', 'discounted', 'discount_type', 'discount_amount')
+    item = table('order_item', column('product_id'), *map(column, names))
+    product = table('product', column('id'), *map(column, names))
+
+    def from_product(name):
+        return select(product.c[name]).where(product.c.id == item.c.product_id).scalar_subquery()
+
+    connection.execute(
+        update(item)
+        .where(item.c.name.is_(None))
+        .values({name: from_product(name) for name in names})
+    )
+
+
+@migration(4)
+def category_summary(connection):
+    # Сводка по категориям для /categories и индекс для её мин./макс. цены.
+    # Заполняется из product; ключ товаров без категории — '' (NO_CATEGORY).
+    Table('category_summary', MetaData(),
+          Column('category', String(80), primary_key=True),
+          Column('product_count', Integer, nullable=False, default=0),
+          Column('discounted_count', Integer, nullable=False, default=0),
+          Column('min_price', Float),
+          Column('max_price', Float)).create(connection, checkfirst=True)
+    create_index(connection, 'ix_product_category_price', 'product', ['category', 'price'])
+
+    names = ('category', 'product_count', 'discounted_count', 'min_price', 'max_price')
+    summary = table('category_summary', *map(column, names))
+    product = table('product', column('category'), column('discounted'), column('price'))
+    key = func.coalesce(product.c.category, '')
+    connection.execute(delete(summary))
+    connection.execute(insert(summary).from_select(
+        list(names),
+        select(key, func.count(), func.sum(case((product.c.discounted, 1), else_=0)),
+               func.min(product.c.price), func.max(product.c.price)).group_by(key)
+    ))
+
+
+@migration(5)
+def product_price_id_index(connection):
+    # Страницы с фильтром по цене идут по (price, id) без сортировки совпадений
+    create_index(connection, 'ix_product_price_id', 'product', ['price', 'id'])
+    create_index(connection, 'ix_product_discounted_price_id', 'product', ['discounted', 'price', 'id'])
+    connection.execute(text('DROP INDEX IF EXISTS ix_product_price'))
+
+
+@migration(6)
+def fts_prefix_index(connection):
+    # Префиксные индексы FTS5 для поиска по началу слова (2 и 3 буквы).
+    # Триггеры product_fts_* обращаются к таблице по имени и остаются.
+    if not search_supported(connection):
+        return
+    connection.execute(text('DROP TABLE IF EXISTS product_fts'))
+    connection.execute(text(
+        "CREATE VIRTUAL TABLE product_fts USING fts5("
+        "name, category, content='product', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"))
+    connection.execute(text("INSERT INTO product_fts(product_fts) VALUES ('rebuild')"))
+
+
+def report(applied):
+    return 'Applied migrations: %s' % (', '.join(map(str, applied)) or 'none, schema is up to date')
+
+
+@click.command('migrate')
+@with_appcontext
+def migrate_command():
+    click.echo(report(upgrade()))
+
+
+if __name__ == '__main__':
+    from app import create_app
+
+    with create_app().app_context():
+        print(report(upgrade()))
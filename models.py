@@ -0,0 +1,141 @@
+from collections import namedtuple
+
+from extensions import db, password_hasher
+
+class User(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String, unique=True, nullable=False)
+    password = db.Column(db.String, nullable=False)
+
+    def set_password(self, secret):
+        self.password = password_hasher.hash(secret)
+
+    def check_password(self, secret):
+        return password_hasher.verify(self.password, secret)
+
+class Product(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(80), nullable=False)
+    category = db.Column(db.String(80))
+    price = db.Column(db.Float, nullable=False)
+    discounted = db.Column(db.Boolean, default=False)
+    discount_type = db.Column(db.String(80))
+    discount_amount = db.Column(db.Float)
+    stock = db.Column(db.Integer)  # NULL — остаток не учитывается
+
+    # Индексы под keyset-пагинацию каталога: фильтр + сортировка по id
+    __table_args__ = (
+        db.Index('ix_product_category_id', 'category', 'id'),
+        db.Index('ix_product_discounted_id', 'discounted', 'id'),
+        # Фильтр по цене: страницы в порядке (price, id), см. ProductList.query_page
+        db.Index('ix_product_price_id', 'price', 'id'),
+        db.Index('ix_product_discounted_price_id', 'discounted', 'price', 'id'),
+        # Мин./макс. цена категории для сводки category_summary
+        db.Index('ix_product_category_price', 'category', 'price'),
+    )
+
+class Cart(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, unique=True)
+    items = db.relationship('CartItem', backref='cart', lazy=True)
+    total_price = db.Column(db.Float, nullable=False)
+    total_discount = db.Column(db.Float, nullable=False)
+
+class Order(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    items = db.relationship('OrderItem', backref='order', lazy=True)
+    total_price = db.Column(db.Float, nullable=False)
+    idempotency_key = db.Column(db.String(64))
+    created_at = db.Column(db.Float)  # unix time; NULL у заказов, оформленных до появления колонки
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'idempotency_key', name='uq_order_user_idempotency_key'),
+        # История заказов: WHERE user_id = ? AND id < ? ORDER BY id DESC LIMIT ?
+        db.Index('ix_order_user_id_id', 'user_id', 'id'),
+    )
+
+class OrderItem(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    price = db.Column(db.Float, nullable=False)  # Цена со скидкой на момент заказа
+    quantity = db.Column(db.Integer, nullable=False, default=1)
+    # Снимок товара на момент заказа: история не зависит от того, как
+    # товар изменился потом, и читается без JOIN с product
+    name = db.Column(db.String(80))
+    category = db.Column(db.String(80))
+    discounted = db.Column(db.Boolean)
+    discount_type = db.Column(db.String(80))
+    discount_amount = db.Column(db.Float)
+
+    __table_args__ = (
+        db.Index('ix_order_item_order_id_id', 'order_id', 'id'),
+    )
+
+class CartItem(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    cart_id = db.Column(db.Integer, db.ForeignKey('cart.id'), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False, default=1)
+    # Сумма строки и скидка по ней на момент последнего изменения:
+    # по ним итоги Cart правятся на разницу, без пересчёта всей корзины
+    line_total = db.Column(db.Float, nullable=False, default=0)
+    line_discount = db.Column(db.Float, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'product_id', name='uq_cart_item_user_product'),
+    )
+
+# Товар, отложенный под корзину: количество уже вычтено из Product.stock
+# и возвращается туда при удалении из корзины или по истечении expires_at
+class StockReservation(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    expires_at = db.Column(db.Float, nullable=False)  # unix time
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'product_id', name='uq_stock_reservation_user_product'),
+        db.Index('ix_stock_reservation_expires_at', 'expires_at'),
+    )
+
+class Job(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(80), nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # JSON
+    status = db.Column(db.String(16), nullable=False)  # pending, running, done, dead
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False)
+    run_at = db.Column(db.Float, nullable=False)  # unix time
+    locked_at = db.Column(db.Float)
+    created_at = db.Column(db.Float, nullable=False)
+    last_error = db.Column(db.Text)
+
+    __table_args__ = (
+        db.Index('ix_job_status_run_at', 'status', 'run_at'),
+    )
+
+# Отозванные токены: выход из системы и уже использованные refresh-токены.
+# Строка нужна, пока токен не истёк; затем её удаляет воркер.
+class RevokedToken(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(36), nullable=False, unique=True)
+    expires_at = db.Column(db.Float, nullable=False, index=True)  # unix time
+
+
+# Сводка каталога по категориям для GET /categories. Поддерживается
+# инкрементально при записи Product (categories.py), не пересчётом.
+class CategorySummary(db.Model):
+    category = db.Column(db.String(80), primary_key=True)  # '' — товары без категории
+    product_count = db.Column(db.Integer, nullable=False, default=0)
+    discounted_count = db.Column(db.Integer, nullable=False, default=0)
+    min_price = db.Column(db.Float)
+    max_price = db.Column(db.Float)
+
+
+# Пользователь JWT-запроса: только то, что нужно ресурсам. ORM-объект
+# между запросами не кэшируем — после закрытия сессии он отсоединён.
+AuthUser = namedtuple('AuthUser', 'id username')
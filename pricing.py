@@ -0,0 +1,91 @@
+from collections import namedtuple
+from decimal import ROUND_HALF_UP, Decimal
+
+CENT = Decimal('0.01')
+HUNDRED = Decimal(100)
+ZERO = Decimal(0)
+ONE = Decimal(1)
+
+# Результат расчёта пачки позиций: цены за единицу, суммы по строкам,
+# скидки по строкам (всё Decimal, округлено до копеек) и итог
+PricedBatch = namedtuple('PricedBatch', 'unit_prices line_totals discounts total')
+
+
+# Правила ценообразования поверх скидки самого товара:
+#   category_promotions — {категория: процент скидки}
+#   quantity_tiers      — [(от скольких штук, процент скидки), ...]
+#   stack               — True: скидки применяются последовательно,
+#                         False: действует одна самая выгодная
+class PricingRules:
+    def __init__(self, category_promotions=None, quantity_tiers=None, stack=True):
+        self.category_promotions = {category: ONE - Decimal(str(percent)) / HUNDRED
+                                    for category, percent in (category_promotions or {}).items()}
+        self.quantity_tiers = sorted(((int(min_qty), ONE - Decimal(str(percent)) / HUNDRED)
+                                      for min_qty, percent in (quantity_tiers or ())), reverse=True)
+        self.stack = stack
+
+    def tier_factor(self, quantity):
+        for min_qty, factor in self.quantity_tiers:
+            if quantity >= min_qty:
+                return factor
+        return ONE
+
+
+DEFAULT_RULES = PricingRules()
+
+
+def price_batch(products, quantities=None, rules=DEFAULT_RULES):
+    # Считает итоговые цены для всей пачки за один проход. Товар — любой
+    # объект с price, category, discounted, discount_type, discount_amount.
+    # Float-цены из БД переводятся в Decimal один раз на значение.
+    if quantities is None:
+        quantities = [1] * len(products)
+
+    decimals = {}
+    tier_factors = {}
+    category_factors = rules.category_promotions
+    stack = rules.stack
+
+    def to_decimal(value):
+        result = decimals.get(value)
+        if result is None:
+            result = decimals[value] = Decimal(str(value))
+        return result
+
+    unit_prices = []
+    line_totals = []
+    discounts = []
+    total = ZERO
+    for product, quantity in zip(products, quantities):
+        base = to_decimal(product.price)
+
+        fixed = ZERO
+        factors = []
+        if product.discounted and product.discount_amount:
+            if product.discount_type == 'Percentage':
+                factors.append(ONE - to_decimal(product.discount_amount) / HUNDRED)
+            elif product.discount_type == 'Fixed':
+                fixed = to_decimal(product.discount_amount)
+        category_factor = category_factors.get(product.category)
+        if category_factor is not None:
+            factors.append(category_factor)
+        if quantity not in tier_factors:
+            tier_factors[quantity] = rules.tier_factor(quantity)
+        if tier_factors[quantity] != ONE:
+            factors.append(tier_factors[quantity])
+
+        if stack:
+            price = base - fixed
+            for factor in factors:
+                price *= factor
+        else:
+            price = min([base - fixed] + [base * factor for factor in factors])
+
+        price = max(price, ZERO).quantize(CENT, ROUND_HALF_UP)
+        line_total = price * quantity
+        unit_prices.append(price)
+        line_totals.append(line_total)
+        discounts.append(base * quantity - line_total)
+        total += line_total
+
+    return PricedBatch(unit_prices, line_totals, discounts, total)
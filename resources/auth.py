@@ -0,0 +1,154 @@
+from flask import Blueprint, current_app, request
+from flask_jwt_extended import create_access_token, create_refresh_token, current_user, get_jwt, jwt_required
+from flask_restful import Api, Resource
+from jwt import InvalidTokenError
+from sqlalchemy import event
+
+from extensions import db, denylist, jwt, login_limiter, password_hasher, user_cache
+from models import AuthUser, User
+from schemas import Field, Schema, json_body
+from security import HasherBusy
+
+bp = Blueprint('auth', __name__)
+api = Api(bp)
+
+CREDENTIALS = Schema(
+    username=Field(str, required=True),
+    password=Field(str, required=True),
+)
+
+
+@jwt.user_lookup_loader
+def lookup_user(jwt_header, jwt_data):
+    # flask_jwt_extended сам хранит результат в рамках запроса (current_user),
+    # здесь — кэш процесса: ноль запросов при попадании, один при промахе.
+    # SQL-выражение строится только при промахе: это дороже самой проверки.
+    user_id = jwt_data.get('uid')
+    if user_id is not None:
+        key = ('id', user_id)
+    else:  # токены, выданные до появления claim uid
+        key = ('username', jwt_data['sub'])
+
+    def load():
+        criterion = User.id == user_id if user_id is not None else User.username == jwt_data['sub']
+        row = db.session.query(User.id, User.username).filter(criterion).first()
+        return AuthUser(*row) if row else None
+
+    return user_cache.get_or_load(key, load)
+
+
+@jwt.user_lookup_error_loader
+def user_not_found(jwt_header, jwt_data):
+    return {'message': 'User not found'}, 404
+
+
+@jwt.token_in_blocklist_loader
+def token_revoked(jwt_header, jwt_data):
+    # Поиск в памяти процесса; БД опрашивается раз в JWT_DENYLIST_SYNC_INTERVAL
+    return denylist.contains(db.session, jwt_data['jti'])
+
+
+@jwt.encode_key_loader
+def signing_key(identity):
+    kid = current_app.config['JWT_SIGNING_KEY_ID']
+    if kid is None:
+        return current_app.config['JWT_SECRET_KEY']
+    return current_app.config['JWT_SIGNING_KEYS'][kid]
+
+
+@jwt.decode_key_loader
+def verification_key(jwt_header, jwt_data):
+    kid = jwt_header.get('kid')
+    if kid is None:  # токены без kid подписаны JWT_SECRET_KEY
+        return current_app.config['JWT_SECRET_KEY']
+    key = current_app.config['JWT_SIGNING_KEYS'].get(kid)
+    if key is None:
+        raise InvalidTokenError('Unknown signing key')
+    return key
+
+
+def issue_tokens(user):
+    # Пара токенов: короткий access и долгий refresh (меняется при каждом /refresh)
+    kid = current_app.config['JWT_SIGNING_KEY_ID']
+    headers = {'kid': kid} if kid is not None else None
+    claims = {'uid': user.id}
+    return {
+        'access_token': create_access_token(identity=user.username, additional_claims=claims,
+                                            additional_headers=headers),
+        'refresh_token': create_refresh_token(identity=user.username, additional_claims=claims,
+                                              additional_headers=headers),
+    }
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def invalidate_users(mapper, connection, target):
+    user_cache.bump()
+
+
+class UserRegistration(Resource):
+    def post(self):
+        data, errors = CREDENTIALS.load(json_body())
+        if errors:
+            return {'message': errors}, 400
+
+        if User.query.filter_by(username=data['username']).first():
+            return {'message': 'User already exists'}, 400
+
+        new_user = User(username=data['username'])
+        try:
+            new_user.set_password(data['password'])
+        except HasherBusy:
+            return {'message': 'Server is busy, try again later'}, 503, {'Retry-After': '1'}
+        db.session.add(new_user)
+        db.session.commit()
+
+        return {'message': 'User registered successfully'}, 201
+
+class UserLogin(Resource):
+    def post(self):
+        data, errors = CREDENTIALS.load(json_body())
+        if errors:
+            return {'message': errors}, 400
+
+        # Отсекаем перебор до того, как тратить время на хэш
+        retry_after = max(login_limiter.hit(('username', data['username'])),
+                          login_limiter.hit(('ip', request.remote_addr)))
+        if retry_after:
+            return {'message': 'Too many login attempts'}, 429, {'Retry-After': str(int(retry_after) + 1)}
+
+        user = User.query.filter_by(username=data['username']).first()
+        try:
+            if not user or not user.check_password(data['password']):
+                return {'message': 'Invalid credentials'}, 401
+            if password_hasher.needs_rehash(user.password):
+                user.set_password(data['password'])
+                db.session.commit()
+        except HasherBusy:
+            return {'message': 'Server is busy, try again later'}, 503, {'Retry-After': '1'}
+
+        return issue_tokens(user), 200
+
+class TokenRefresh(Resource):
+    @jwt_required(refresh=True)
+    def post(self):
+        # Ротация: использованный refresh-токен отзывается, выдаётся новая пара.
+        # Повтор того же токена (в том числе украденного) получит 401.
+        token = get_jwt()
+        if not denylist.revoke(db.session, token['jti'], token['exp']):
+            return {'message': 'Token has been revoked'}, 401
+        return issue_tokens(current_user), 200
+
+class UserLogout(Resource):
+    @jwt_required(verify_type=False)
+    def post(self):
+        # Отзывает предъявленный токен: access — сразу, refresh — вместе с сессией
+        token = get_jwt()
+        denylist.revoke(db.session, token['jti'], token['exp'])
+        return {'message': 'Token revoked'}, 200
+
+
+api.add_resource(UserRegistration, '/register')
+api.add_resource(UserLogin, '/login')
+api.add_resource(TokenRefresh, '/refresh')
+api.add_resource(UserLogout, '/logout')
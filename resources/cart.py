@@ -0,0 +1,392 @@
+import time
+
+from flask import Blueprint, current_app, request
+from flask_jwt_extended import jwt_required, current_user
+from flask_restful import Api, Resource
+from sqlalchemy import case, delete, func, insert, select, update
+
+from database import dialect_insert
+from extensions import db, pricing_rules
+from models import Cart, CartItem, Product, StockReservation
+from pricing import price_batch
+from resources.catalog import ProductList
+from schemas import Field, Schema, json_body
+
+bp = Blueprint('cart', __name__)
+api = Api(bp)
+
+
+def load_cart(user_id):
+    # Позиции корзины вместе с товарами одним запросом (без N+1).
+    # Возвращает [(cart_item, product), ...].
+    return db.session.query(CartItem, Product) \
+        .join(Product, Product.id == CartItem.product_id) \
+        .filter(CartItem.user_id == user_id) \
+        .order_by(CartItem.id) \
+        .all()
+
+
+def cart_id_for(user_id):
+    cart_id = db.session.query(Cart.id).filter_by(user_id=user_id).scalar()
+    if cart_id is None:
+        statement = dialect_insert(db.engine.dialect.name, Cart.__table__) \
+            .values(user_id=user_id, total_price=0, total_discount=0) \
+            .on_conflict_do_nothing(index_elements=['user_id'])
+        db.session.execute(statement)
+        cart_id = db.session.query(Cart.id).filter_by(user_id=user_id).scalar()
+    return cart_id
+
+
+def adjust_cart_totals(cart_id, price_delta, discount_delta):
+    db.session.execute(
+        update(Cart)
+        .where(Cart.id == cart_id)
+        .values(total_price=func.round(Cart.total_price + price_delta, 2),
+                total_discount=func.round(Cart.total_discount + discount_delta, 2))
+    )
+
+
+def add_to_cart(user_id, product, quantity):
+    # Upsert строки (user, product): повторное добавление увеличивает
+    # количество. Первым идёт запись, поэтому дальнейшие чтения в этой
+    # транзакции уже под блокировкой и итоги не разъедутся при гонке.
+    # Возвращает новое количество или None, если товара не хватает.
+    if not reserve_stock(user_id, product, quantity):
+        return None
+    cart_id = cart_id_for(user_id)
+    statement = dialect_insert(db.engine.dialect.name, CartItem.__table__)
+    statement = statement \
+        .values(user_id=user_id, product_id=product.id, cart_id=cart_id,
+                quantity=quantity, line_total=0, line_discount=0) \
+        .on_conflict_do_update(index_elements=['user_id', 'product_id'],
+                               set_={'quantity': CartItem.quantity + statement.excluded.quantity}) \
+        .returning(CartItem.id, CartItem.quantity, CartItem.line_total, CartItem.line_discount)
+    line = db.session.execute(statement).one()
+    set_line_totals(cart_id, line, product, line.quantity)
+    return line.quantity
+
+
+def set_line_totals(cart_id, line, product, quantity):
+    # Пересчитывает одну строку (скидки от количества нелинейны) и сдвигает
+    # итоги корзины на разницу со старыми значениями строки
+    priced = price_batch([product], [quantity], pricing_rules)
+    line_total = float(priced.line_totals[0])
+    line_discount = float(priced.discounts[0])
+    db.session.execute(
+        update(CartItem)
+        .where(CartItem.id == line.id)
+        .values(quantity=quantity, line_total=line_total, line_discount=line_discount)
+    )
+    adjust_cart_totals(cart_id, line_total - line.line_total, line_discount - line.line_discount)
+
+
+def remove_from_cart(user_id, product_id):
+    line = db.session.execute(
+        delete(CartItem)
+        .where(CartItem.user_id == user_id, CartItem.product_id == product_id)
+        .returning(CartItem.cart_id, CartItem.line_total, CartItem.line_discount)
+    ).first()
+    if line is None:
+        return False
+    adjust_cart_totals(line.cart_id, -line.line_total, -line.line_discount)
+    release_reservations(user_id, [product_id])
+    return True
+
+
+def take_stock(quantities):
+    # {product_id: кол-во} — списание одним условным UPDATE на всю пачку.
+    # Если хоть одного товара не хватает, обновится меньше строк, чем
+    # товаров, и вызывающий код должен откатить транзакцию.
+    if not quantities:
+        return True
+    amount = case(quantities, value=Product.id)
+    result = db.session.execute(
+        update(Product)
+        .where(Product.id.in_(list(quantities)), Product.stock >= amount)
+        .values(stock=Product.stock - amount)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == len(quantities)
+
+
+def return_stock(quantities):
+    if not quantities:
+        return
+    amount = case(quantities, value=Product.id)
+    db.session.execute(
+        update(Product)
+        .where(Product.id.in_(list(quantities)), Product.stock.isnot(None))
+        .values(stock=Product.stock + amount)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def reserve_stock(user_id, product, quantity):
+    # Откладывает товар под корзину на STOCK_RESERVATION_TTL секунд
+    # (повторное добавление продлевает срок). Товары без учёта остатка
+    # не резервируются.
+    if product.stock is None:
+        return True
+    if not take_stock({product.id: quantity}):
+        return False
+    hold_stock(user_id, {product.id: quantity})
+    return True
+
+
+def hold_stock(user_id, quantities):
+    # Записывает уже списанное со склада в резервы пользователя одним
+    # executemany: {product_id: кол-во} добавляется к существующему резерву
+    if not quantities:
+        return
+    statement = dialect_insert(db.engine.dialect.name, StockReservation.__table__)
+    expires_at = time.time() + current_app.config['STOCK_RESERVATION_TTL']
+    db.session.execute(
+        statement.on_conflict_do_update(index_elements=['user_id', 'product_id'],
+                                        set_={'quantity': StockReservation.quantity + statement.excluded.quantity,
+                                              'expires_at': expires_at}),
+        [{'user_id': user_id, 'product_id': product_id, 'quantity': quantity, 'expires_at': expires_at}
+         for product_id, quantity in quantities.items()]
+    )
+
+
+def claim_reservations(user_id, product_ids):
+    # Снимает резервы пользователя и возвращает {product_id: кол-во}; сток
+    # при этом не меняется — решает вызывающий код
+    rows = db.session.execute(
+        delete(StockReservation)
+        .where(StockReservation.user_id == user_id, StockReservation.product_id.in_(product_ids))
+        .returning(StockReservation.product_id, StockReservation.quantity)
+    )
+    return {product_id: quantity for product_id, quantity in rows}
+
+
+def release_reservations(user_id, product_ids):
+    return_stock(claim_reservations(user_id, product_ids))
+
+
+def release_expired_reservations():
+    # Возвращает на склад просроченные резервы. Вызывается воркером.
+    now = time.time()
+    if db.session.query(StockReservation.id).filter(StockReservation.expires_at < now).first() is None:
+        return 0
+    expired = db.session.execute(
+        delete(StockReservation)
+        .where(StockReservation.expires_at < now)
+        .returning(StockReservation.product_id, StockReservation.quantity)
+    ).all()
+    quantities = {}
+    for product_id, quantity in expired:
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    return_stock(quantities)
+    db.session.commit()
+    return len(expired)
+
+
+CART_QUANTITY_MAX = 1000  # Штук одного товара за одну операцию
+
+CART_ITEM = Schema(
+    product_id=Field(int, required=True),
+    quantity=Field(int, default=1, minimum=1, maximum=CART_QUANTITY_MAX),
+)
+
+CART_BATCH_MAX = 100  # Операций в одном PATCH /cart
+# Схема полей операции PATCH /cart по её типу
+CART_OPERATIONS = {
+    'add': Schema(
+        product_id=Field(int, required=True),
+        quantity=Field(int, default=1, minimum=1, maximum=CART_QUANTITY_MAX),
+    ),
+    'remove': Schema(
+        product_id=Field(int, required=True),
+    ),
+    'set': Schema(
+        product_id=Field(int, required=True),
+        quantity=Field(int, required=True, minimum=0, maximum=CART_QUANTITY_MAX),
+    ),
+}
+
+
+def parse_operations(payload):
+    # {"operations": [{"op": "add"|"remove"|"set", "product_id": ..., "quantity": ...}]}
+    # Возвращает ([(op, product_id, quantity), ...], None) или (None, ошибка)
+    operations = payload.get('operations') if isinstance(payload, dict) else None
+    if not isinstance(operations, list) or not operations:
+        return None, 'operations must be a non-empty list'
+    if len(operations) > CART_BATCH_MAX:
+        return None, 'At most %d operations per request' % CART_BATCH_MAX
+    parsed = []
+    for number, operation in enumerate(operations):
+        op = operation.get('op') if isinstance(operation, dict) else None
+        if op not in CART_OPERATIONS:
+            return None, 'operations[%d].op must be one of: %s' % (number, ', '.join(CART_OPERATIONS))
+        data, errors = CART_OPERATIONS[op].load(operation)
+        if errors:
+            name, message = next(iter(errors.items()))
+            return None, 'operations[%d].%s: %s' % (number, name, message)
+        parsed.append((op, data['product_id'], data.get('quantity')))
+    return parsed, None
+
+
+def apply_operations(user_id, operations, products):
+    # Применяет операции к корзине одним набором запросов независимо от их
+    # числа: операции сворачиваются в итоговое количество по каждому товару,
+    # затем один DELETE, один INSERT и один UPDATE (executemany) позиций и
+    # одно изменение итогов корзины. products — {id: Product}.
+    # Возвращает False, если товара не хватает (транзакцию надо откатить).
+    cart_id = cart_id_for(user_id)
+    # Первая запись блокирует корзину: параллельные изменения той же
+    # корзины ждут, и прочитанные ниже строки не устареют
+    adjust_cart_totals(cart_id, 0, 0)
+    current = {line.product_id: line for line in db.session.execute(
+        select(CartItem.id, CartItem.product_id, CartItem.quantity, CartItem.line_total, CartItem.line_discount)
+        .where(CartItem.user_id == user_id, CartItem.product_id.in_(list(products)))
+    )}
+
+    targets = {}
+    for op, product_id, quantity in operations:
+        target = targets.get(product_id, current[product_id].quantity if product_id in current else 0)
+        if op == 'add':
+            target += quantity
+        elif op == 'set':
+            target = quantity
+        else:
+            target = 0
+        targets[product_id] = target
+    changed = {product_id: target for product_id, target in targets.items()
+               if target != (current[product_id].quantity if product_id in current else 0)}
+    if not changed:
+        return True
+    if not update_reservations(user_id, products, current, changed):
+        return False
+
+    kept = [product_id for product_id, target in changed.items() if target > 0]
+    removed = [product_id for product_id, target in changed.items() if target == 0 and product_id in current]
+    priced = price_batch([products[product_id] for product_id in kept],
+                         [changed[product_id] for product_id in kept], pricing_rules)
+    rows = []
+    price_delta = discount_delta = 0
+    for product_id, line_total, line_discount in zip(kept, priced.line_totals, priced.discounts):
+        rows.append({'user_id': user_id, 'product_id': product_id, 'cart_id': cart_id,
+                     'quantity': changed[product_id],
+                     'line_total': float(line_total), 'line_discount': float(line_discount)})
+        price_delta += float(line_total)
+        discount_delta += float(line_discount)
+    for product_id in changed:
+        if product_id in current:
+            price_delta -= current[product_id].line_total
+            discount_delta -= current[product_id].line_discount
+
+    if removed:
+        db.session.execute(delete(CartItem).where(CartItem.user_id == user_id, CartItem.product_id.in_(removed)))
+    inserts = [row for row in rows if row['product_id'] not in current]
+    if inserts:
+        db.session.execute(insert(CartItem), inserts)
+    updates = [dict(row, id=current[row['product_id']].id) for row in rows if row['product_id'] in current]
+    if updates:
+        db.session.execute(update(CartItem), updates)
+    adjust_cart_totals(cart_id, price_delta, discount_delta)
+    return True
+
+
+def update_reservations(user_id, products, current, changed):
+    # Рост количества списывается со склада одним условным UPDATE на все
+    # товары; при уменьшении резерв урезается до нового количества, а
+    # излишек возвращается на склад
+    grow = {}
+    shrink = {}
+    for product_id, target in changed.items():
+        if products[product_id].stock is None:
+            continue
+        difference = target - (current[product_id].quantity if product_id in current else 0)
+        if difference > 0:
+            grow[product_id] = difference
+        else:
+            shrink[product_id] = target
+    if not take_stock(grow):
+        return False
+    held = claim_reservations(user_id, list(shrink)) if shrink else {}
+    return_stock({product_id: quantity - shrink[product_id]
+                  for product_id, quantity in held.items() if quantity > shrink[product_id]})
+    keep = {product_id: min(quantity, shrink[product_id])
+            for product_id, quantity in held.items() if min(quantity, shrink[product_id]) > 0}
+    hold_stock(user_id, {**grow, **keep})
+    return True
+
+
+def cart_line(cart_item, line):
+    line['quantity'] = cart_item.quantity
+    line['line_total'] = cart_item.line_total
+    return line
+
+
+class ShoppingCart(Resource):
+    @jwt_required()
+    def get(self):
+        return self.cart_response(current_user.id)
+
+    @staticmethod
+    def cart_response(user_id):
+        cart = Cart.query.filter_by(user_id=user_id).first()
+        lines = load_cart(user_id) if cart else []
+        # Товары корзины оформляются одним вызовом, а не по одному на позицию
+        products = ProductList.add_product_list([product for _, product in lines])
+
+        return {
+            'cart': [cart_line(cart_item, line) for (cart_item, _), line in zip(lines, products)],
+            'total_price': cart.total_price if cart else 0,
+            'total_discount': cart.total_discount if cart else 0
+        }
+
+    @jwt_required()
+    def post(self):
+        user = current_user
+
+        data, errors = CART_ITEM.load(json_body())
+        if errors:
+            return {'message': errors}, 400
+
+        product = Product.query.get(data['product_id'])
+        if not product:
+            return {'message': 'Product not found'}, 404
+
+        quantity = add_to_cart(user.id, product, data['quantity'])
+        if quantity is None:
+            db.session.rollback()
+            return {'message': 'Not enough stock'}, 409
+        db.session.commit()
+
+        return {'message': 'Product added to cart successfully', 'quantity': quantity}, 201
+
+    @jwt_required()
+    def delete(self, product_id):
+        user = current_user
+
+        if not remove_from_cart(user.id, product_id):
+            return {'message': 'Product not found in cart'}, 404
+
+        db.session.commit()
+        return {'message': 'Product removed from cart'}, 200
+
+    @jwt_required()
+    def patch(self):
+        # Пакет операций add/remove/set одной транзакцией; ответ — корзина
+        user = current_user
+        operations, error = parse_operations(request.get_json(silent=True))
+        if error:
+            return {'message': error}, 400
+
+        product_ids = {product_id for _, product_id, _ in operations}
+        products = {product.id: product for product in Product.query.filter(Product.id.in_(product_ids))}
+        missing = sorted(product_ids - set(products))
+        if missing:
+            return {'message': 'Product not found', 'product_ids': missing}, 404
+
+        if not apply_operations(user.id, operations, products):
+            db.session.rollback()
+            return {'message': 'Not enough stock'}, 409
+        db.session.commit()
+
+        return self.cart_response(user.id)
+
+
+api.add_resource(ShoppingCart, '/cart', '/cart/<int:product_id>')
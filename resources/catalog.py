@@ -0,0 +1,262 @@
+import itertools
+
+from flask import Blueprint, has_app_context, request, url_for
+from flask_jwt_extended import jwt_required
+from flask_restful import Api, Resource
+from sqlalchemy import event, select, tuple_
+from sqlalchemy.orm import Session, object_session
+
+import categories  # noqa: F401 — сводку по категориям обновляют события Product
+from extensions import catalog_cache, catalog_snapshot, db, job_queue, pricing_rules
+from models import CategorySummary, Product
+from pricing import price_batch
+from responses import CachedBody, stream_json_array, stream_ndjson
+from schemas import Field, Schema
+from search import search_products, search_supported
+
+bp = Blueprint('catalog', __name__)
+api = Api(bp)
+
+
+# Любое изменение Product через ORM сбрасывает кэш каталога
+@event.listens_for(Product, 'after_insert')
+@event.listens_for(Product, 'after_update')
+@event.listens_for(Product, 'after_delete')
+def invalidate_catalog(mapper, connection, target):
+    catalog_cache.bump()
+    session = object_session(target)
+    if session is not None:
+        session.info['catalog_dirty'] = True
+
+
+@event.listens_for(Session, 'before_flush')
+def queue_catalog_snapshot(session, flush_context, instances):
+    # Общий снимок каталога пересобирает воркер; задача ставится в той же
+    # транзакции, что и изменение товаров, — одна на транзакцию
+    if session.info.get('catalog_snapshot_queued') or not has_app_context() or not catalog_snapshot.enabled:
+        return
+    if any(isinstance(obj, Product) for obj in itertools.chain(session.new, session.dirty, session.deleted)):
+        job_queue.enqueue(session, 'catalog_snapshot', {})
+        session.info['catalog_snapshot_queued'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def invalidate_catalog_on_commit(session):
+    # Повторный сброс после фиксации: между flush и commit параллельный
+    # запрос мог прочитать и закэшировать ещё старые данные
+    session.info.pop('catalog_snapshot_queued', None)
+    if session.info.pop('catalog_dirty', False):
+        catalog_cache.bump()
+        catalog_snapshot.mark_stale()
+
+
+@event.listens_for(Session, 'after_rollback')
+def forget_catalog_changes(session):
+    session.info.pop('catalog_dirty', None)
+    session.info.pop('catalog_snapshot_queued', None)
+
+
+PRODUCTS_PAGE_SIZE = 50
+PRODUCTS_PAGE_SIZE_MAX = 200
+PRODUCTS_STREAM_BATCH = 1000  # Строк на одну выборку/отправку при потоковой выдаче
+
+PRODUCT_LIST_ARGS = Schema(
+    limit=Field(int),
+    after=Field(int),
+    after_price=Field(float),
+    category=Field(str),
+    discounted=Field(bool),
+    min_price=Field(float),
+    max_price=Field(float),
+    stream=Field(bool, default=False),
+)
+
+
+class ProductList(Resource):
+    @jwt_required()
+    def get(self, product_id=None):
+        if product_id is None:
+            args, errors = PRODUCT_LIST_ARGS.load(request.args)
+            if errors:
+                return {'message': errors}, 400
+
+            ndjson = request.accept_mimetypes.best_match(
+                ['application/json', 'application/x-ndjson']) == 'application/x-ndjson'
+            if ndjson or args['stream']:
+                # Потоковая выгрузка без постраничной разбивки (limit необязателен)
+                if args['limit'] is not None and args['limit'] < 1:
+                    return {'message': 'limit must be positive'}, 400
+                batches = self.stream_batches(args)
+                return stream_ndjson(batches) if ndjson else stream_json_array(batches)
+
+            if args['limit'] is None:
+                args['limit'] = PRODUCTS_PAGE_SIZE
+            if not 1 <= args['limit'] <= PRODUCTS_PAGE_SIZE_MAX:
+                return {'message': 'limit must be between 1 and %d' % PRODUCTS_PAGE_SIZE_MAX}, 400
+            if self.by_price(args) and args['after'] is not None and args['after_price'] is None:
+                return {'message': {'after_price': 'Required with after and a price filter'}}, 400
+
+            key = ('list', args['limit'], args['after'], args['after_price'], args['category'],
+                   args['discounted'], args['min_price'], args['max_price'])
+            body, next_cursor = catalog_cache.get_or_load(key, lambda: self.load_page(args))
+
+            headers = {}
+            if next_cursor is not None:
+                next_args = {k: v for k, v in request.args.items() if k not in ('after', 'after_price')}
+                next_url = url_for('.productlist', **next_cursor, **next_args)
+                headers['X-Next-Cursor'] = str(next_cursor['after'])
+                if 'after_price' in next_cursor:
+                    headers['X-Next-Cursor-Price'] = str(next_cursor['after_price'])
+                headers['Link'] = '<%s>; rel="next"' % next_url
+            return body.make_response(headers=headers)
+        else:
+            # Сначала общий снимок: ни запроса к БД, ни сериализации
+            body = catalog_snapshot.lookup(product_id)
+            if body is None:
+                body = catalog_cache.get_or_load(('id', product_id), lambda: self.load_product(product_id))
+            if body is not None:
+                return body.make_response()
+            else:
+                return {'message': 'Product not found'}, 404
+
+    @classmethod
+    def load_page(cls, args):
+        products = cls.query_page(args)
+        next_cursor = None
+        if len(products) > args['limit']:
+            products = products[:args['limit']]
+            next_cursor = {'after': products[-1].id}
+            if cls.by_price(args):
+                next_cursor['after_price'] = products[-1].price
+        return CachedBody(cls.add_product_list(products)), next_cursor
+
+    @classmethod
+    def load_product(cls, product_id):
+        product = Product.query.get(product_id)
+        if product is None:
+            return None
+        return CachedBody(cls.add_product_list([product]))
+
+    @classmethod
+    def query_page(cls, args):
+        # Keyset-пагинация: WHERE id > :after ORDER BY id LIMIT :limit + 1,
+        # лишняя строка показывает, есть ли следующая страница. С фильтром
+        # по цене страница идёт по индексу (price, id) с курсором
+        # (after_price, after): при порядке по id БД выбрала бы индекс цены
+        # и сортировала бы все совпадения диапазона ради одной страницы.
+        if not cls.by_price(args):
+            return cls.filter_query(Product.query, args).order_by(Product.id).limit(args['limit'] + 1).all()
+        query = cls.filter_query(Product.query, dict(args, after=None))
+        if args['after'] is not None:
+            query = query.filter(tuple_(Product.price, Product.id) > tuple_(args['after_price'], args['after']))
+        return query.order_by(Product.price, Product.id).limit(args['limit'] + 1).all()
+
+    @staticmethod
+    def by_price(args):
+        return args['min_price'] is not None or args['max_price'] is not None
+
+    @classmethod
+    def stream_batches(cls, args):
+        # Колонки вместо ORM-объектов: строки не копятся в identity map сессии,
+        # а yield_per читает курсор пачками — память не зависит от объёма
+        query = cls.filter_query(select(*Product.__table__.columns), args).order_by(Product.id)
+        if args['limit'] is not None:
+            query = query.limit(args['limit'])
+        result = db.session.execute(query.execution_options(yield_per=PRODUCTS_STREAM_BATCH))
+        for rows in result.partitions():
+            yield cls.add_product_list(rows)
+
+    @staticmethod
+    def filter_query(query, args):
+        if args['category'] is not None:
+            query = query.filter(Product.category == args['category'])
+        if args['discounted'] is not None:
+            query = query.filter(Product.discounted == args['discounted'])
+        if args['min_price'] is not None:
+            query = query.filter(Product.price >= args['min_price'])
+        if args['max_price'] is not None:
+            query = query.filter(Product.price <= args['max_price'])
+        if args['after'] is not None:
+            query = query.filter(Product.id > args['after'])
+        return query
+
+    @staticmethod
+    def add_product_list(products):
+        product_list = []
+        final_prices = price_batch(products, rules=pricing_rules).unit_prices
+        for product, final_price in zip(products, final_prices):
+            product_list.append({
+                'id': product.id,
+                'name': product.name,
+                'category': product.category,
+                'price': product.price,
+                'final_price': float(final_price),
+                'discounted': product.discounted,
+                'discount': {
+                    'type': product.discount_type,
+                    'amount': product.discount_amount
+                } if product.discounted else None
+            })
+        return product_list
+
+SEARCH_PAGE_SIZE = 20
+SEARCH_PAGE_SIZE_MAX = 100
+
+SEARCH_ARGS = Schema(
+    q=Field(str, required=True),
+    limit=Field(int, default=SEARCH_PAGE_SIZE),
+    category=Field(str),
+    discounted=Field(bool),
+)
+
+
+class ProductSearch(Resource):
+    @jwt_required()
+    def get(self):
+        args, errors = SEARCH_ARGS.load(request.args)
+        if errors:
+            return {'message': errors}, 400
+
+        if not search_supported(db.engine):
+            return {'message': 'Search is not available for this database'}, 501
+        if not 1 <= args['limit'] <= SEARCH_PAGE_SIZE_MAX:
+            return {'message': 'limit must be between 1 and %d' % SEARCH_PAGE_SIZE_MAX}, 400
+
+        key = ('search', args['q'], args['limit'], args['category'], args['discounted'])
+        body = catalog_cache.get_or_load(key, lambda: self.load_results(args))
+        return body.make_response()
+
+    @staticmethod
+    def load_results(args):
+        ids, total, facets, exact = search_products(db.session, args['q'], args['limit'],
+                                                    args['category'], args['discounted'])
+        products = {product.id: product for product in Product.query.filter(Product.id.in_(ids))} if ids else {}
+        return CachedBody({
+            'results': ProductList.add_product_list([products[product_id] for product_id in ids]),
+            'total': total,
+            'facets': facets,
+            'exact': exact
+        })
+
+
+class CategoryList(Resource):
+    @jwt_required()
+    def get(self):
+        # Строки готовой сводки, а не товары: время не зависит от размера каталога
+        body = catalog_cache.get_or_load(('categories',), self.load_categories)
+        return body.make_response()
+
+    @staticmethod
+    def load_categories():
+        return CachedBody([{
+            'category': row.category or None,
+            'product_count': row.product_count,
+            'discounted_count': row.discounted_count,
+            'min_price': row.min_price,
+            'max_price': row.max_price
+        } for row in CategorySummary.query.order_by(CategorySummary.category)])
+
+
+api.add_resource(ProductList, '/products', '/products/<int:product_id>')
+api.add_resource(ProductSearch, '/products/search')
+api.add_resource(CategoryList, '/categories')
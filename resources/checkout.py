@@ -0,0 +1,149 @@
+import time
+
+from flask import Blueprint, request
+from flask_jwt_extended import jwt_required, current_user
+from flask_restful import Api, Resource
+from sqlalchemy import delete, insert
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db, job_queue, pricing_rules
+from models import Cart, CartItem, Order, OrderItem
+from pricing import price_batch
+from resources.cart import adjust_cart_totals, claim_reservations, load_cart, return_stock, take_stock
+from resources.orders import order_items
+
+bp = Blueprint('checkout', __name__)
+api = Api(bp)
+
+
+class Checkout(Resource):
+    @jwt_required()
+    def post(self):
+        user = current_user
+        idempotency_key = request.headers.get('Idempotency-Key')
+        if idempotency_key is not None and not 0 < len(idempotency_key) <= 64:
+            return {'message': 'Idempotency-Key must be 1-64 characters'}, 400
+
+        if idempotency_key is not None:
+            order = Order.query.filter_by(user_id=user.id, idempotency_key=idempotency_key).first()
+            if order:
+                return self.replay(order)
+
+        cart_id = db.session.query(Cart.id).filter_by(user_id=user.id).scalar()
+        if cart_id is None:
+            return {'message': 'Cart is empty'}, 400
+        # Первая запись блокирует корзину (как в apply_operations): изменения
+        # корзины параллельными запросами ждут до конца оформления, и
+        # прочитанные ниже позиции и их суммы не устареют к DELETE
+        adjust_cart_totals(cart_id, 0, 0)
+        lines = load_cart(user.id)
+        if not lines:
+            db.session.rollback()
+            if idempotency_key is not None:
+                # Повтор, пришедший во время первого оформления, ждал
+                # блокировку корзины: заказ уже создан, а корзина очищена
+                order = Order.query.filter_by(user_id=user.id, idempotency_key=idempotency_key).first()
+                if order:
+                    return self.replay(order)
+            return {'message': 'Cart is empty'}, 400
+
+        products = [product for _, product in lines]
+        quantities = [cart_item.quantity for cart_item, _ in lines]
+        priced = price_batch(products, quantities, pricing_rules)
+        total_price = float(priced.total)
+        ordered_items = [self.ordered_item(product, float(price), quantity)
+                         for product, price, quantity in zip(products, priced.unit_prices, quantities)]
+
+        # Одна транзакция с постоянным числом запросов: DELETE корзины,
+        # UPDATE её итогов, INSERT заказа и один executemany INSERT позиций.
+        removed = db.session.execute(
+            delete(CartItem).where(CartItem.user_id == user.id, CartItem.id <= lines[-1][0].id)
+        ).rowcount
+        if removed != len(lines):
+            # Корзину уже оформил или изменил параллельный запрос
+            db.session.rollback()
+            return {'message': 'Cart changed during checkout, please retry'}, 409
+        adjust_cart_totals(cart_id,
+                           -sum(cart_item.line_total for cart_item, _ in lines),
+                           -sum(cart_item.line_discount for cart_item, _ in lines))
+        if not self.commit_stock(user.id, lines):
+            db.session.rollback()
+            return {'message': 'Not enough stock'}, 409
+
+        order = Order(user_id=user.id, total_price=total_price, idempotency_key=idempotency_key,
+                      created_at=time.time())
+        db.session.add(order)
+        try:
+            db.session.flush()
+        except IntegrityError:
+            # Параллельный повтор с тем же Idempotency-Key успел первым
+            db.session.rollback()
+            order = Order.query.filter_by(user_id=user.id, idempotency_key=idempotency_key).first()
+            return self.replay(order)
+        # Позиции хранят снимок товара: история заказов читается без product.
+        # Вставка через таблицу: ORM-вставка опускает None (скидки нет) и
+        # режет executemany на отдельные INSERT при чередовании скидок
+        db.session.execute(insert(OrderItem.__table__), [
+            {'order_id': order.id, 'product_id': product.id, 'price': ordered_item['price'],
+             'quantity': ordered_item['quantity'], 'name': product.name, 'category': product.category,
+             'discounted': product.discounted, 'discount_type': product.discount_type,
+             'discount_amount': product.discount_amount}
+            for product, ordered_item in zip(products, ordered_items)
+        ])
+        # Письма, аналитика и прочее — в фоне; задача фиксируется вместе с заказом
+        job_queue.enqueue(db.session, 'order_placed', {'order_id': order.id, 'user_id': user.id})
+        db.session.commit()
+
+        return self.order_response(order, ordered_items), 201
+
+    @staticmethod
+    def commit_stock(user_id, lines):
+        # Резервы корзины переходят в заказ. Разница между количеством в
+        # корзине и отложенным (резерв истёк и вернулся на склад, или его не
+        # было) списывается одним условным UPDATE, излишек возвращается.
+        tracked = [(cart_item, product) for cart_item, product in lines if product.stock is not None]
+        if not tracked:
+            return True
+        held = claim_reservations(user_id, [product.id for _, product in tracked])
+        need = {}
+        surplus = {}
+        for cart_item, product in tracked:
+            difference = cart_item.quantity - held.get(product.id, 0)
+            if difference > 0:
+                need[product.id] = difference
+            elif difference < 0:
+                surplus[product.id] = -difference
+        return_stock(surplus)
+        return take_stock(need)
+
+    @staticmethod
+    def ordered_item(product, price, quantity):
+        return {
+            'id': product.id,
+            'name': product.name,
+            'category': product.category,
+            'price': price,
+            'quantity': quantity,
+            'discounted': product.discounted,
+            'discount': {
+                'type': product.discount_type,
+                'amount': product.discount_amount
+            } if product.discounted else None
+        }
+
+    @staticmethod
+    def order_response(order, ordered_items):
+        return {
+            'message': 'Order placed successfully',
+            'order_id': order.id,
+            'total_price': order.total_price,
+            'ordered_items': ordered_items
+        }
+
+    @classmethod
+    def replay(cls, order):
+        # Повтор запроса с тем же Idempotency-Key: отдаём уже созданный заказ
+        return cls.order_response(order, order_items([order.id])[order.id]), 201
+
+
+api.add_resource(Checkout, '/checkout')
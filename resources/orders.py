@@ -0,0 +1,94 @@
+from flask import Blueprint, request, url_for
+from flask_jwt_extended import jwt_required, current_user
+from flask_restful import Api, Resource
+
+from extensions import db
+from models import Order, OrderItem
+from schemas import Field, Schema
+
+bp = Blueprint('orders', __name__)
+api = Api(bp)
+
+ORDERS_PAGE_SIZE = 20
+ORDERS_PAGE_SIZE_MAX = 100
+
+ORDER_LIST_ARGS = Schema(
+    limit=Field(int, default=ORDERS_PAGE_SIZE),
+    before=Field(int),
+)
+
+
+def order_items(order_ids):
+    # Позиции нескольких заказов одним запросом по индексу (order_id, id),
+    # из снимка в OrderItem — без JOIN с product. {order_id: [позиция, ...]}
+    items = {order_id: [] for order_id in order_ids}
+    if not order_ids:
+        return items
+    rows = db.session.query(OrderItem) \
+        .filter(OrderItem.order_id.in_(order_ids)) \
+        .order_by(OrderItem.order_id, OrderItem.id)
+    for row in rows:
+        items[row.order_id].append(snapshot_item(row))
+    return items
+
+
+def snapshot_item(order_item):
+    return {
+        'id': order_item.product_id,
+        'name': order_item.name,
+        'category': order_item.category,
+        'price': order_item.price,
+        'quantity': order_item.quantity,
+        'discounted': order_item.discounted,
+        'discount': {
+            'type': order_item.discount_type,
+            'amount': order_item.discount_amount
+        } if order_item.discounted else None
+    }
+
+
+def order_summary(order, ordered_items):
+    return {
+        'order_id': order.id,
+        'total_price': order.total_price,
+        'created_at': order.created_at,
+        'ordered_items': ordered_items
+    }
+
+
+class OrderList(Resource):
+    @jwt_required()
+    def get(self, order_id=None):
+        user = current_user
+        if order_id is not None:
+            order = Order.query.filter_by(id=order_id, user_id=user.id).first()
+            if not order:
+                return {'message': 'Order not found'}, 404
+            return order_summary(order, order_items([order.id])[order.id])
+
+        args, errors = ORDER_LIST_ARGS.load(request.args)
+        if errors:
+            return {'message': errors}, 400
+        if not 1 <= args['limit'] <= ORDERS_PAGE_SIZE_MAX:
+            return {'message': 'limit must be between 1 and %d' % ORDERS_PAGE_SIZE_MAX}, 400
+
+        # Новые заказы первыми, keyset-пагинация по индексу (user_id, id):
+        # WHERE user_id = ? AND id < :before ORDER BY id DESC LIMIT :limit + 1
+        query = Order.query.filter(Order.user_id == user.id)
+        if args['before'] is not None:
+            query = query.filter(Order.id < args['before'])
+        orders = query.order_by(Order.id.desc()).limit(args['limit'] + 1).all()
+
+        headers = {}
+        if len(orders) > args['limit']:
+            orders = orders[:args['limit']]
+            next_cursor = orders[-1].id
+            next_args = {k: v for k, v in request.args.items() if k != 'before'}
+            headers['X-Next-Cursor'] = str(next_cursor)
+            headers['Link'] = '<%s>; rel="next"' % url_for('.orderlist', before=next_cursor, **next_args)
+
+        items = order_items([order.id for order in orders])
+        return [order_summary(order, items[order.id]) for order in orders], 200, headers
+
+
+api.add_resource(OrderList, '/orders', '/orders/<int:order_id>')
@@ -0,0 +1,105 @@
+import gzip
+import hashlib
+import json
+
+from flask import Response, request, stream_with_context
+
+from metrics import metrics
+
+try:
+    import brotli
+except ImportError:  # brotli не обязателен, без него отдаём gzip
+    brotli = None
+
+try:
+    import orjson
+except ImportError:  # без orjson сериализуем стандартным json
+    orjson = None
+
+COMPRESS_MIN_SIZE = 1024  # Меньшие ответы не сжимаем
+
+
+def dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data).encode('utf-8')
+
+
+# Сериализованный JSON-ответ со strong ETag и лениво сжатыми вариантами тела.
+# Хранится в кэше каталога, поэтому повторные запросы не сериализуют данные
+# заново, а If-None-Match проверяется без обращения к данным вообще.
+class CachedBody:
+    def __init__(self, data):
+        with metrics.timed_serialization():
+            self.body = dumps(data) + b'\n'
+        self.etag = hashlib.sha1(self.body).hexdigest()
+        self._encoded = {}
+
+    @classmethod
+    def serialized(cls, body, etag):
+        # Тело, сериализованное заранее (снимок каталога, snapshot.py)
+        cached = cls.__new__(cls)
+        cached.body = body
+        cached.etag = etag
+        cached._encoded = {}
+        return cached
+
+    def encode(self, encoding):
+        if encoding not in self._encoded:
+            if encoding == 'br':
+                self._encoded[encoding] = brotli.compress(self.body)
+            else:
+                self._encoded[encoding] = gzip.compress(self.body, compresslevel=6)
+        return self._encoded[encoding]
+
+    def choose_encoding(self):
+        if len(self.body) < COMPRESS_MIN_SIZE:
+            return None
+        accepted = request.accept_encodings
+        if brotli is not None and accepted['br']:
+            return 'br'
+        if accepted['gzip']:
+            return 'gzip'
+        return None
+
+    def make_response(self, status=200, headers=None):
+        # У каждого варианта тела свой strong ETag: байты gzip, br и
+        # несжатого тела разные, и кэш не должен подменять один другим
+        encoding = self.choose_encoding()
+        etag = self.etag if encoding is None else '%s-%s' % (self.etag, encoding)
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        elif encoding is None:
+            response = Response(self.body, status=status, mimetype='application/json')
+        else:
+            response = Response(self.encode(encoding), status=status, mimetype='application/json')
+            response.headers['Content-Encoding'] = encoding
+        response.set_etag(etag)
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['Cache-Control'] = 'private, no-cache'
+        if headers:
+            response.headers.extend(headers)
+        return response
+
+
+# Потоковая отдача списков: batches — итератор пачек словарей, каждая
+# пачка кодируется и отправляется отдельно, весь ответ в памяти не держится
+def stream_json_array(batches):
+    def generate():
+        separator = b'['
+        for batch in batches:
+            if batch:
+                yield separator + b','.join(dumps(item) for item in batch)
+                separator = b','
+        yield b'[]\n' if separator == b'[' else b']\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+
+def stream_ndjson(batches):
+    def generate():
+        for batch in batches:
+            if batch:
+                yield b''.join(dumps(item) + b'\n' for item in batch)
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
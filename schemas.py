@@ -0,0 +1,146 @@
+# Декларативные схемы входных данных вместо reqparse. Схема описывается
+# на уровне модуля ресурса и компилируется один раз при импорте; load()
+# проходит по полям один раз и не разбирает тело запроса заново на каждый
+# аргумент, как RequestParser.
+#   CREDENTIALS = Schema(username=Field(str, required=True), ...)
+#   data, errors = CREDENTIALS.load(json_body())
+#   if errors:
+#       return {'message': errors}, 400
+# Ошибки — {поле: сообщение}, в том же виде, что отдавал reqparse.
+import math
+
+from flask import request
+from werkzeug.routing import IntegerConverter
+
+TRUE_VALUES = frozenset(['true', '1', 'yes', 'on'])
+FALSE_VALUES = frozenset(['false', '0', 'no', 'off'])
+# Целые за пределами BIGINT база не примет (OverflowError в драйвере)
+INT_MIN = -2 ** 63
+INT_MAX = 2 ** 63 - 1
+
+
+def to_str(value):
+    if not isinstance(value, str):
+        raise ValueError()
+    return value
+
+
+def to_int(value):
+    # Строки — для параметров URL; bool в JSON числом не считается
+    if isinstance(value, str):
+        value = int(value)
+    elif isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError()
+    if not INT_MIN <= value <= INT_MAX:
+        raise ValueError()
+    return value
+
+
+class BoundedIntConverter(IntegerConverter):
+    # <int:...> в URL с теми же границами: id вне BIGINT — 404, а не
+    # OverflowError в драйвере. Подменяет int в create_app
+    def __init__(self, map, *args, **kwargs):
+        kwargs.setdefault('max', INT_MAX)
+        super().__init__(map, *args, **kwargs)
+
+
+def to_float(value):
+    if isinstance(value, str):
+        value = float(value)
+    elif isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError()
+    if not math.isfinite(value):
+        raise ValueError()
+    return float(value)
+
+
+def to_bool(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        if value.lower() in TRUE_VALUES:
+            return True
+        if value.lower() in FALSE_VALUES:
+            return False
+    raise ValueError()
+
+
+# Тип поля -> (преобразование, сообщение об ошибке)
+CONVERTERS = {
+    str: (to_str, 'Must be a string'),
+    int: (to_int, 'Must be an integer'),
+    float: (to_float, 'Must be a number'),
+    bool: (to_bool, 'Must be a boolean'),
+}
+
+
+class Field:
+    def __init__(self, type=str, required=False, default=None, minimum=None, maximum=None,
+                 help='This field cannot be blank'):
+        if type not in CONVERTERS:
+            raise ValueError('Unsupported field type %r' % type)
+        self.type = type
+        self.required = required
+        self.default = default
+        self.minimum = minimum
+        self.maximum = maximum
+        self.help = help  # Сообщение, если обязательное поле не передано
+
+
+class Schema:
+    def __init__(self, **fields):
+        self.fields = fields
+        # Всё, что нужно при проверке, собрано в кортежи заранее
+        self._compiled = tuple(
+            (name, CONVERTERS[field.type][0], CONVERTERS[field.type][1], field.required, field.default,
+             field.help, field.minimum, field.maximum, range_message(field.minimum, field.maximum))
+            for name, field in fields.items()
+        )
+
+    def load(self, source):
+        # source — dict из JSON-тела или MultiDict параметров URL.
+        # Возвращает (данные, None) или (None, {поле: ошибка})
+        if source is None:
+            source = {}
+        elif not hasattr(source, 'get'):
+            return None, {'body': 'Must be a JSON object'}
+        data = {}
+        errors = None
+        for name, convert, invalid, required, default, missing, minimum, maximum, out_of_range in self._compiled:
+            value = source.get(name)
+            if value is None or (required and value == ''):
+                if required:
+                    errors = errors or {}
+                    errors[name] = missing
+                data[name] = default
+                continue
+            try:
+                value = convert(value)
+            except ValueError:
+                errors = errors or {}
+                errors[name] = invalid
+                continue
+            if (minimum is not None and value < minimum) or (maximum is not None and value > maximum):
+                errors = errors or {}
+                errors[name] = out_of_range
+                continue
+            data[name] = value
+        if errors:
+            return None, errors
+        return data, None
+
+
+def range_message(minimum, maximum):
+    if minimum is not None and maximum is not None:
+        return 'Must be between %s and %s' % (minimum, maximum)
+    if minimum is not None:
+        return 'Must be at least %s' % minimum
+    if maximum is not None:
+        return 'Must be at most %s' % maximum
+    return None
+
+
+def json_body():
+    # Тело запроса: JSON-объект или, как принимал reqparse, данные формы
+    data = request.get_json(silent=True)
+    return data if data is not None else request.form
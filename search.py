@@ -0,0 +1,127 @@
+# Полнотекстовый поиск по товарам на SQLite FTS5.
+# product_fts — external content таблица над product (name, category):
+# текст не дублируется, а индекс поддерживают триггеры, поэтому он
+# обновляется при любой записи в product, в том числе при массовом импорте.
+#
+# Время запроса почти не зависит от числа совпадений: префиксы из трёх
+# букв ищутся по префиксному индексу FTS5 (prefix='2 3', миграция 6), по
+# релевантности упорядочиваются первые SEARCH_RANK_LIMIT совпадений,
+# совпадения считаются до SEARCH_COUNT_LIMIT, а фасеты — по выборке из
+# SEARCH_FACET_SAMPLE совпадений, пересчитанной на их число. Если
+# совпадений больше выборки, total и фасеты — оценка (exact = False), а
+# при SEARCH_COUNT_LIMIT и больше — оценка снизу. Дороже всего длинный
+# префикс частого слова: FTS5 собирает все подходящие слова в памяти
+# (bench/bench_search.py).
+import re
+
+from sqlalchemy import bindparam, text
+
+SEARCH_RANK_LIMIT = 200  # Совпадений, среди которых выбираются самые релевантные
+SEARCH_FACET_SAMPLE = 500  # Совпадений, по которым считаются фасеты
+SEARCH_COUNT_LIMIT = 10000  # Дальше совпадения не считаются
+PREFIX_MIN_LENGTH = 3  # Более короткие слова ищутся целиком
+
+# Схема миграции 1; префиксные индексы добавляет миграция 6
+FTS_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS product_fts USING fts5(
+        name, category, content='product', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS product_fts_insert AFTER INSERT ON product BEGIN
+        INSERT INTO product_fts(rowid, name, category) VALUES (new.id, new.name, new.category);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS product_fts_delete AFTER DELETE ON product BEGIN
+        INSERT INTO product_fts(product_fts, rowid, name, category) VALUES ('delete', old.id, old.name, old.category);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS product_fts_update AFTER UPDATE OF name, category ON product BEGIN
+        INSERT INTO product_fts(product_fts, rowid, name, category) VALUES ('delete', old.id, old.name, old.category);
+        INSERT INTO product_fts(rowid, name, category) VALUES (new.id, new.name, new.category);
+    END""",
+]
+
+WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def search_supported(bind):
+    return bind.dialect.name == 'sqlite'
+
+
+def install_fts(connection):
+    # Вызывается миграцией, в её транзакции
+    if not search_supported(connection):
+        return
+    created = not connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'product_fts'")).first()
+    for statement in FTS_DDL:
+        connection.execute(text(statement))
+    if created:
+        # Индекс для товаров, добавленных до появления таблицы
+        connection.execute(text("INSERT INTO product_fts(product_fts) VALUES ('rebuild')"))
+
+
+def match_expression(query):
+    # Пользовательский ввод не передаём в MATCH как есть (там свой синтаксис):
+    # слова объединяются через AND. По префиксу ищется только последнее
+    # слово (его ещё набирают) и только от трёх букв: каждый префикс без
+    # своего индекса FTS5 собирает из всех подходящих слов в памяти
+    words = WORD.findall(query)
+    terms = ['"%s"' % word for word in words]
+    if words and len(words[-1]) >= PREFIX_MIN_LENGTH:
+        terms[-1] += '*'
+    return ' AND '.join(terms)
+
+
+def search_products(session, query, limit, category=None, discounted=None):
+    # Возвращает (id товаров по релевантности (bm25), всего совпадений,
+    # фасеты, точны ли счётчики). Фасеты считаются по всем совпадениям без
+    # учёта фильтров category/discounted, чтобы клиент видел, что даст смена
+    # фильтра.
+    expression = match_expression(query)
+    if not expression:
+        return [], 0, {'category': {}, 'discounted': {'true': 0, 'false': 0}}, True
+
+    filters = ''
+    params = {'match': expression, 'limit': limit, 'rank_limit': SEARCH_RANK_LIMIT}
+    if category is not None:
+        filters += ' AND p.category = :category'
+        params['category'] = category
+    if discounted is not None:
+        filters += ' AND p.discounted = :discounted'
+        params['discounted'] = discounted
+
+    # bm25 считается только для первых rank_limit подходящих совпадений:
+    # ORDER BY rank по всем совпадениям стоит O(совпадений). CROSS JOIN
+    # фиксирует порядок в SQLite: иначе планировщик обходит product по
+    # индексу фильтра и проверяет MATCH для каждой строки
+    ids = session.execute(text(
+        'SELECT m.rowid FROM (SELECT product_fts.rowid, product_fts.rank FROM product_fts'
+        + (' CROSS JOIN product p ON p.id = product_fts.rowid' if filters else '')
+        + ' WHERE product_fts MATCH :match' + filters + ' LIMIT :rank_limit) m ORDER BY m.rank LIMIT :limit'
+    ), params).scalars().all()
+
+    # Совпадения по индексу FTS одним запросом: их число — total, первые
+    # из них — выборка для фасетов (префикс собирается в памяти один раз)
+    sample = session.execute(text(
+        'SELECT rowid, COUNT(*) OVER () FROM '
+        '(SELECT rowid FROM product_fts WHERE product_fts MATCH :match LIMIT :count_limit) LIMIT :sample'
+    ), {'match': expression, 'count_limit': SEARCH_COUNT_LIMIT, 'sample': SEARCH_FACET_SAMPLE}).all()
+    matches = sample[0][1] if sample else 0
+    rows = session.execute(text(
+        'SELECT category, discounted, COUNT(*) FROM product WHERE id IN :ids GROUP BY category, discounted'
+    ).bindparams(bindparam('ids', expanding=True)), {'ids': [row[0] for row in sample]}).all() if sample else []
+    exact = matches <= SEARCH_FACET_SAMPLE
+    scale = 1 if exact else matches / SEARCH_FACET_SAMPLE
+
+    facets = {'category': {}, 'discounted': {'true': 0, 'false': 0}}
+    total = 0
+    for row_category, row_discounted, count in rows:
+        key = row_category or ''  # товары без категории
+        facets['category'][key] = facets['category'].get(key, 0) + count
+        facets['discounted']['true' if row_discounted else 'false'] += count
+        if (category is None or row_category == category) and \
+                (discounted is None or bool(row_discounted) == discounted):
+            total += count
+    if not exact:
+        facets['category'] = {key: round(count * scale) for key, count in facets['category'].items()}
+        facets['discounted'] = {key: round(count * scale) for key, count in facets['discounted'].items()}
+        total = matches if category is None and discounted is None else round(total * scale)
+    return ids, total, facets, exact
@@ -0,0 +1,195 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from contextvars import ContextVar
+
+import jwt
+from flask import current_app
+from flask_jwt_extended import JWTManager
+from sqlalchemy import delete, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.util import await_only
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+
+class HasherBusy(Exception):
+    pass
+
+
+# True, пока запрос обслуживается в гринлете поверх event loop (asgi.py):
+# ждать результат из пула потоков тогда нужно через loop, а не блокируя
+# поток, в котором идут все остальные запросы
+in_event_loop = ContextVar('in_event_loop', default=False)
+
+
+# Хэширование паролей в ограниченном пуле потоков. hashlib отпускает GIL,
+# поэтому PBKDF2 считается параллельно, а размер очереди ограничен: при
+# перегрузке сразу отказываем (HasherBusy), а не копим ожидающие запросы.
+class PasswordHasher:
+    def __init__(self, method='pbkdf2:sha256:260000', workers=4, queue_size=64, timeout=5):
+        self.method = method
+        self.stored_method = stored_method(method)
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hasher')
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+
+    def _submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy()
+        try:
+            future = self._pool.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda f: self._slots.release())
+        if in_event_loop.get():
+            try:
+                return await_only(asyncio.wait_for(asyncio.wrap_future(future), self.timeout))
+            except asyncio.TimeoutError:
+                raise HasherBusy()
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise HasherBusy()
+
+    def hash(self, secret):
+        return self._submit(generate_password_hash, secret, self.method)
+
+    def verify(self, pwhash, secret):
+        return self._submit(check_password_hash, pwhash, secret)
+
+    def needs_rehash(self, pwhash):
+        # Формат werkzeug: method$salt$hash, method включает число итераций
+        return pwhash.split('$', 1)[0] != self.stored_method
+
+
+def stored_method(method):
+    # Метод в том виде, в каком werkzeug пишет его в хэш: 'pbkdf2:sha256'
+    # сохраняется как 'pbkdf2:sha256:260000' (итерации по умолчанию)
+    if method.startswith('pbkdf2:') and method.count(':') == 1:
+        return '%s:%d' % (method, DEFAULT_PBKDF2_ITERATIONS)
+    return method
+
+
+# Ограничение частоты попыток (token bucket) по произвольному ключу:
+# имени пользователя, IP-адресу. Хранит не больше maxsize ключей.
+class RateLimiter:
+    def __init__(self, rate, period, maxsize=100000):
+        self.capacity = rate
+        self.refill = rate / period
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key):
+        # Возвращает 0, если попытка разрешена, иначе сколько секунд ждать
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated) * self.refill)
+            if tokens >= 1:
+                tokens -= 1
+                retry_after = 0
+            else:
+                retry_after = (1 - tokens) / self.refill
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+            return retry_after
+
+
+# Отозванные токены (jti) в памяти процесса. Источник — таблица model в
+# БД: новые строки подтягиваются не чаще раза в sync_interval секунд, так
+# что проверка токена — поиск в dict, без SQL-запроса на каждый запрос.
+# Отзыв, сделанный в другом процессе, виден здесь через sync_interval.
+class Denylist:
+    SYNC_OVERLAP = 1000  # Сколько последних id перечитывать при синхронизации
+    PRUNE_INTERVAL = 60  # Как часто выбрасывать из памяти истёкшие токены, сек
+
+    def __init__(self, model, sync_interval=1.0):
+        self.model = model
+        self.sync_interval = sync_interval
+        self._expires = {}  # jti -> unix time истечения токена
+        self._last_id = 0
+        self._synced_at = None
+        self._pruned_at = 0
+        self._lock = threading.Lock()
+
+    def contains(self, session, jti):
+        synced_at = self._synced_at
+        if synced_at is None or time.monotonic() - synced_at >= self.sync_interval:
+            self.sync(session)
+        return jti in self._expires
+
+    def revoke(self, session, jti, expires_at):
+        # Фиксирует отзыв отдельной транзакцией. False — токен уже был отозван
+        # (например, параллельная ротация того же refresh-токена успела первой).
+        try:
+            session.execute(insert(self.model).values(jti=jti, expires_at=expires_at))
+            session.commit()
+        except IntegrityError:
+            session.rollback()
+            return False
+        self._expires[jti] = expires_at
+        return True
+
+    def sync(self, session):
+        # Синхронизирует один запрос, остальные пока проверяют по текущему
+        # состоянию. Не ждём блокировку: в asgi.py все запросы — гринлеты
+        # одного потока, и ожидание во время запроса к БД повесило бы loop.
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            if self._synced_at is not None and time.monotonic() - self._synced_at < self.sync_interval:
+                return
+            model = self.model
+            now = time.time()
+            # В PostgreSQL id выдаётся до commit, и строка с меньшим id может
+            # появиться позже, поэтому хвост перечитывается с запасом
+            rows = session.execute(
+                select(model.id, model.jti, model.expires_at)
+                .where(model.id > self._last_id - self.SYNC_OVERLAP, model.expires_at > now)
+                .order_by(model.id)
+            ).all()
+            if now - self._pruned_at >= self.PRUNE_INTERVAL:
+                # Новый словарь подменяет старый целиком: читатели без блокировки
+                self._expires = {jti: expires_at for jti, expires_at in self._expires.items() if expires_at > now}
+                self._pruned_at = now
+            for row_id, jti, expires_at in rows:
+                self._expires[jti] = expires_at
+                self._last_id = max(self._last_id, row_id)
+            self._synced_at = time.monotonic()
+        finally:
+            self._lock.release()
+
+    def purge(self, session):
+        # Удаляет из БД записи об истёкших токенах. Вызывается воркером.
+        result = session.execute(delete(self.model).where(self.model.expires_at <= time.time()))
+        session.commit()
+        return result.rowcount
+
+
+# JWTManager с кэшем проверенных токенов: повторный запрос с тем же токеном
+# не разбирает его и не проверяет подпись заново, а берёт claims из кэша
+# до истечения exp. Ключ кэша — токен целиком вместе с подписью, поэтому
+# подделанный токен в кэш не попадёт. Отзыв и пользователь проверяются
+# как обычно. Ключ, которым подписан токен (kid), проверяется и при
+# попадании в кэш: токены убранного из JWT_SIGNING_KEYS ключа перестают
+# приниматься сразу. Переопределяет внутренний метод flask_jwt_extended 4.5.
+class CachingJWTManager(JWTManager):
+    def _decode_jwt_from_config(self, encoded_token, csrf_value=None, allow_expired=False):
+        if csrf_value is not None or allow_expired:
+            return super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+        cache = current_app.extensions['shop']['token_cache']
+        cached = cache.get(encoded_token)
+        if cached is not None:
+            kid, claims = cached
+            if (claims.get('exp', float('inf')) > time.time()
+                    and (kid is None or kid in current_app.config['JWT_SIGNING_KEYS'])):
+                return claims
+        # Промах или ключ больше не настроен: полная проверка (и ошибка, если токен не годен)
+        claims = super()._decode_jwt_from_config(encoded_token)
+        cache.set(encoded_token, (jwt.get_unverified_header(encoded_token).get('kid'), claims))
+        return claims
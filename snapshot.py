@@ -0,0 +1,177 @@
+# Снимок каталога в файле, общий для всех воркеров: каждый товар заранее
+# сериализован в ответ GET /products/<id> (форма add_product_list), а
+# воркеры отображают файл в память (mmap). Страницы файла делит между
+# процессами ОС, поэтому память не умножается на число воркеров и не
+# прогревается заново после перезапуска. Поиск товара — бинарный поиск по
+# массиву id прямо в отображённом файле, без SQL-запросов.
+#
+# Файл (порядок байт машины, файл собирается и читается на одном хосте):
+#   заголовок  MAGIC, время сборки, число товаров
+#   id         int64 по возрастанию
+#   записи     смещение тела, длина, sha1 тела (ETag)
+#   тела       JSON-ответы подряд
+#
+# Снимок пересобирает воркер (задача catalog_snapshot ставится в той же
+# транзакции, что и изменение Product) во временный файл, который затем
+# атомарно подменяет прежний (os.replace). Процессы замечают новый файл по
+# stat не чаще раза в check_interval секунд, без перезапуска.
+#   flask --app app catalog-snapshot
+import hashlib
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from responses import CachedBody, dumps
+
+MAGIC = b'CATSNAP1'
+HEADER = struct.Struct('=8sdQ')
+ENTRY = struct.Struct('=QI20s')
+ALL_PRODUCTS = {'limit': None, 'after': None, 'after_price': None, 'category': None, 'discounted': None,
+                'min_price': None, 'max_price': None}
+
+
+def build(path):
+    # Собирает снимок из текущего каталога и атомарно подменяет файл path.
+    # Вызывается в контексте приложения (цены считаются по его правилам).
+    from resources.catalog import ProductList
+
+    built_at = time.time()
+    directory = os.path.dirname(os.path.abspath(path))
+    ids = array('q')
+    entries = bytearray()
+    temporary = []
+    try:
+        # Тела пишутся во временный файл по мере чтения каталога: их
+        # смещение в снимке станет известно, только когда известно число товаров
+        fd, bodies_path = tempfile.mkstemp(dir=directory, prefix='.catalog-bodies-')
+        temporary.append(bodies_path)
+        with os.fdopen(fd, 'w+b') as bodies:
+            offset = 0
+            for batch in ProductList.stream_batches(ALL_PRODUCTS):
+                for item in batch:
+                    body = dumps([item]) + b'\n'  # как CachedBody(add_product_list([product]))
+                    ids.append(item['id'])
+                    entries += ENTRY.pack(offset, len(body), hashlib.sha1(body).digest())
+                    bodies.write(body)
+                    offset += len(body)
+
+            fd, snapshot_path = tempfile.mkstemp(dir=directory, prefix='.catalog-snapshot-')
+            temporary.append(snapshot_path)
+            with os.fdopen(fd, 'wb') as target:
+                target.write(HEADER.pack(MAGIC, built_at, len(ids)))
+                target.write(ids.tobytes())
+                target.write(entries)
+                bodies.seek(0)
+                shutil.copyfileobj(bodies, target, 1 << 20)
+                target.flush()
+                os.fsync(target.fileno())
+        os.chmod(snapshot_path, 0o644)
+        os.replace(snapshot_path, path)
+        temporary.remove(snapshot_path)
+    finally:
+        for leftover in temporary:
+            try:
+                os.unlink(leftover)
+            except FileNotFoundError:
+                pass
+    return len(ids)
+
+
+class Mapping:
+    # Один отображённый файл снимка; заменяется целиком при пересборке
+    def __init__(self, stat_key, data):
+        magic, self.built_at, count = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError('Not a catalog snapshot')
+        self.stat_key = stat_key
+        self.data = data
+        self.ids = memoryview(data)[HEADER.size:HEADER.size + count * 8].cast('q')
+        self.entries_at = HEADER.size + count * 8
+        self.bodies_at = self.entries_at + count * ENTRY.size
+
+    def lookup(self, product_id):
+        ids = self.ids
+        index = bisect_left(ids, product_id)
+        if index == len(ids) or ids[index] != product_id:
+            return None
+        offset, length, digest = ENTRY.unpack_from(self.data, self.entries_at + index * ENTRY.size)
+        start = self.bodies_at + offset
+        return CachedBody.serialized(self.data[start:start + length], digest.hex())
+
+
+class CatalogSnapshot:
+    # Читатель снимка в процессе воркера. path=None — снимок выключен.
+    def __init__(self, path=None, check_interval=1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._mapping = None
+        self._checked_at = None
+        self._stale_since = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.path is not None
+
+    def lookup(self, product_id):
+        # CachedBody ответа /products/<id> или None: товара нет в снимке,
+        # снимок выключен или старше изменений каталога в этом процессе
+        if self.path is None:
+            return None
+        checked_at = self._checked_at
+        if checked_at is None or time.monotonic() - checked_at >= self.check_interval:
+            self.reload()
+        mapping = self._mapping
+        if mapping is None:
+            return None
+        stale_since = self._stale_since
+        if stale_since is not None and mapping.built_at < stale_since:
+            return None
+        return mapping.lookup(product_id)
+
+    def reload(self):
+        # Как Denylist.sync: проверяет один запрос, остальные не ждут
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._checked_at = time.monotonic()
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                self._mapping = None
+                return
+            stat_key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            if self._mapping is not None and self._mapping.stat_key == stat_key:
+                return
+            with open(self.path, 'rb') as source:
+                data = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+            # Прежнее отображение не закрываем: его могут читать параллельные
+            # запросы; память освободится, когда на него не останется ссылок
+            self._mapping = Mapping(stat_key, data)
+        finally:
+            self._lock.release()
+
+    def mark_stale(self):
+        # Каталог изменён в этом процессе: до нового снимка читаем из БД
+        self._stale_since = time.time()
+
+
+@click.command('catalog-snapshot')
+@with_appcontext
+def snapshot_command():
+    path = current_app.config['CATALOG_SNAPSHOT_PATH']
+    if not path:
+        raise click.UsageError('CATALOG_SNAPSHOT_PATH is not set')
+    started = time.perf_counter()
+    count = build(path)
+    click.echo('%d products written to %s in %.1f s' % (count, path, time.perf_counter() - started))
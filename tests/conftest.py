@@ -0,0 +1,39 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from migrations import upgrade  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path / 'test.db'),
+        'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',  # Быстрый хэш: тестам стойкость не нужна
+        'JWT_DENYLIST_SYNC_INTERVAL': 3600,  # Синхронизация denylist не добавляет запросов посреди теста
+    })
+    with app.app_context():
+        upgrade()
+    yield app
+    with app.app_context():
+        from extensions import db
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def login(client):
+    # login('name') -> заголовки с токеном нового пользователя
+    def login(username, password='password'):
+        client.post('/register', json={'username': username, 'password': password})
+        token = client.post('/login', json={'username': username, 'password': password}).get_json()['access_token']
+        return {'Authorization': 'Bearer ' + token}
+    return login
@@ -0,0 +1,72 @@
+# Число SQL-запросов корзины и оформления заказа не должно зависеть от
+# числа позиций: корзина из 1 и из 40 товаров — одинаковое число запросов.
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event, insert
+
+from extensions import db
+from models import Product
+
+PRODUCTS = 40
+
+
+@pytest.fixture
+def products(app):
+    with app.app_context():
+        db.session.execute(insert(Product), [
+            {'id': product_id, 'name': 'Product %d' % product_id, 'category': 'Books',
+             'price': 10.0 + product_id, 'discounted': product_id % 2 == 0,
+             'discount_type': 'Percentage' if product_id % 2 == 0 else None,
+             'discount_amount': 10.0 if product_id % 2 == 0 else None}
+            for product_id in range(1, PRODUCTS + 1)
+        ])
+        db.session.commit()
+    return list(range(1, PRODUCTS + 1))
+
+
+@contextmanager
+def count_statements(app):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def fill_cart(client, headers, product_ids):
+    for product_id in product_ids:
+        assert client.post('/cart', json={'product_id': product_id}, headers=headers).status_code == 201
+    # Прогрев: пользователь и токен попадают в кэши до подсчёта
+    assert client.get('/cart', headers=headers).status_code == 200
+
+
+def measure(app, request):
+    with count_statements(app) as statements:
+        response = request()
+    return response, len(statements)
+
+
+def test_cart_and_checkout_query_count_is_constant(app, client, login, products):
+    small, large = login('small'), login('large')
+    fill_cart(client, small, products[:1])
+    fill_cart(client, large, products)
+
+    small_cart, small_queries = measure(app, lambda: client.get('/cart', headers=small))
+    large_cart, large_queries = measure(app, lambda: client.get('/cart', headers=large))
+    assert len(small_cart.get_json()['cart']) == 1
+    assert len(large_cart.get_json()['cart']) == PRODUCTS
+    assert small_queries == large_queries
+
+    small_order, small_queries = measure(app, lambda: client.post('/checkout', headers=small))
+    large_order, large_queries = measure(app, lambda: client.post('/checkout', headers=large))
+    assert small_order.status_code == large_order.status_code == 201
+    assert len(large_order.get_json()['ordered_items']) == PRODUCTS
+    assert small_queries == large_queries
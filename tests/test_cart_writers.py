@@ -0,0 +1,55 @@
+# Несколько процессов (как воркеры gunicorn) одновременно пишут в корзины
+# одной SQLite-базы: ни одной ошибки "database is locked".
+# Большая нагрузка — bench/bench_cart_writers.py.
+import multiprocessing
+
+from extensions import db
+from models import Product, User
+
+PROCESSES = 4
+WRITES = 20
+
+
+def writer(uri, username, writes, results):
+    from flask_jwt_extended import create_access_token
+    from app import create_app
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': uri})
+    with app.app_context():
+        user = User.query.filter_by(username=username).first()
+        token = create_access_token(identity=user.username, additional_claims={'uid': user.id})
+    client = app.test_client()
+    headers = {'Authorization': 'Bearer ' + token}
+    errors = []
+    for _ in range(writes):
+        try:
+            response = client.post('/cart', json={'product_id': 1}, headers=headers)
+            if response.status_code != 201:
+                errors.append('%d %s' % (response.status_code, response.get_data(as_text=True)))
+        except Exception as exc:  # OperationalError: database is locked
+            errors.append(repr(exc))
+    results.put(errors)
+
+
+def test_concurrent_cart_writers_do_not_fail(app):
+    with app.app_context():
+        db.session.add(Product(id=1, name='Product', category='Books', price=1.0))
+        for number in range(PROCESSES):
+            db.session.add(User(username='writer%d' % number, password='-'))
+        db.session.commit()
+        uri = app.config['SQLALCHEMY_DATABASE_URI']
+
+    ctx = multiprocessing.get_context('spawn')
+    results = ctx.Queue()
+    workers = [ctx.Process(target=writer, args=(uri, 'writer%d' % number, WRITES, results))
+               for number in range(PROCESSES)]
+    for worker in workers:
+        worker.start()
+    errors = [error for _ in workers for error in results.get(timeout=120)]
+    for worker in workers:
+        worker.join()
+
+    assert errors == []
+    with app.app_context():
+        quantities = db.session.execute(db.text('SELECT quantity FROM cart_item')).scalars().all()
+    assert quantities == [WRITES] * PROCESSES
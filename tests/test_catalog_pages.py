@@ -0,0 +1,63 @@
+# Страницы /products с фильтром по цене идут по индексу (price, id):
+# курсор (after_price, after) обходит все совпадения, и БД не сортирует их.
+import pytest
+from sqlalchemy import insert, text
+
+from extensions import db
+from models import Product
+
+PRODUCTS = 60
+
+
+@pytest.fixture
+def products(app):
+    with app.app_context():
+        # Цены повторяются, чтобы курсор проходил и по товарам с равной ценой
+        db.session.execute(insert(Product), [
+            {'id': product_id, 'name': 'Product %d' % product_id, 'category': 'AB'[product_id % 2],
+             'price': float(product_id % 7), 'discounted': product_id % 3 == 0}
+            for product_id in range(1, PRODUCTS + 1)
+        ])
+        db.session.commit()
+
+
+def walk(client, headers, url):
+    ids = []
+    while url:
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200
+        ids += [product['id'] for product in response.get_json()]
+        link = response.headers.get('Link')
+        url = link[1:link.index('>')] if link else None
+    return ids
+
+
+@pytest.mark.parametrize('query, where', [
+    ('min_price=2', lambda p: p['price'] >= 2),
+    ('min_price=1&max_price=4&category=A', lambda p: 1 <= p['price'] <= 4 and p['category'] == 'A'),
+    ('max_price=5&discounted=true', lambda p: p['price'] <= 5 and p['discounted']),
+])
+def test_price_filter_pages_cover_matches_in_price_order(app, client, login, products, query, where):
+    headers = login('reader')
+    expected = sorted(
+        ({'id': product_id, 'price': float(product_id % 7), 'category': 'AB'[product_id % 2],
+          'discounted': product_id % 3 == 0} for product_id in range(1, PRODUCTS + 1)),
+        key=lambda p: (p['price'], p['id']))
+    assert walk(client, headers, '/products?limit=7&' + query) == [p['id'] for p in expected if where(p)]
+
+
+def test_price_cursor_requires_after_price(client, login, products):
+    response = client.get('/products?min_price=1&after=10', headers=login('reader'))
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('where', [
+    'price >= 1',
+    "category = 'A' AND price >= 1 AND price <= 4",
+    'discounted = 1 AND price <= 5',
+])
+def test_price_filter_pages_do_not_sort_matches(app, where):
+    with app.app_context():
+        plan = db.session.execute(text(
+            'EXPLAIN QUERY PLAN SELECT id FROM product WHERE %s ORDER BY price, id LIMIT 51' % where)).all()
+    assert not any('TEMP B-TREE' in row[-1] for row in plan)
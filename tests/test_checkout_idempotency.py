@@ -0,0 +1,48 @@
+# Повтор POST /checkout с тем же Idempotency-Key, пришедший, пока первый
+# запрос ещё оформляет заказ, получает тот же заказ, а не "Cart is empty".
+import threading
+import time
+
+from sqlalchemy import event
+
+from extensions import db
+from models import Product
+
+
+def test_retry_during_checkout_replays_order(app, client, login):
+    with app.app_context():
+        db.session.add(Product(id=1, name='Book', category='Books', price=10.0, discounted=False))
+        db.session.commit()
+        engine = db.engine
+    headers = login('buyer')
+    assert client.post('/cart', json={'product_id': 1, 'quantity': 2}, headers=headers).status_code == 201
+    headers = dict(headers, **{'Idempotency-Key': 'order-1'})
+
+    # Первый запрос задерживается на INSERT заказа, уже держа блокировку корзины
+    inserting = threading.Event()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith('INSERT INTO "order"') and not inserting.is_set():
+            inserting.set()
+            time.sleep(1)
+
+    responses = {}
+
+    def checkout(name):
+        response = app.test_client().post('/checkout', headers=headers)
+        responses[name] = (response.status_code, response.get_json())
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        first = threading.Thread(target=checkout, args=('first',))
+        first.start()
+        assert inserting.wait(5)
+        retry = threading.Thread(target=checkout, args=('retry',))
+        retry.start()
+        first.join()
+        retry.join()
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+    assert responses['first'][0] == 201
+    assert responses['retry'] == responses['first']
@@ -0,0 +1,20 @@
+# id в пути за пределами BIGINT не доходят до БД: 404, а не 500
+import pytest
+
+TOO_BIG = str(10 ** 22)
+
+
+@pytest.mark.parametrize('method, path', [
+    ('get', '/orders/' + TOO_BIG),
+    ('get', '/products/' + TOO_BIG),
+    ('delete', '/cart/' + TOO_BIG),
+])
+def test_out_of_range_path_id_is_not_found(client, login, method, path):
+    response = getattr(client, method)(path, headers=login('reader'))
+    assert response.status_code == 404
+
+
+def test_largest_path_id_is_looked_up(client, login):
+    response = client.get('/products/%d' % (2 ** 63 - 1), headers=login('reader'))
+    assert response.status_code == 404
+    assert response.get_json() == {'message': 'Product not found'}
@@ -0,0 +1,71 @@
+# Параллельные оформления заказа из нескольких процессов не продают
+# больше, чем было на складе: sold + left == stock, остаток не уходит в минус.
+# Большая нагрузка — bench/bench_stock.py.
+import multiprocessing
+
+from sqlalchemy import func
+
+from extensions import db
+from models import OrderItem, Product, User
+
+PROCESSES = 4
+ATTEMPTS = 20
+STOCK = PROCESSES * ATTEMPTS // 2
+
+
+def buyer(uri, username, attempts, results):
+    from flask_jwt_extended import create_access_token
+    from app import create_app
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': uri})
+    with app.app_context():
+        user = User.query.filter_by(username=username).first()
+        token = create_access_token(identity=user.username, additional_claims={'uid': user.id})
+    client = app.test_client()
+    headers = {'Authorization': 'Bearer ' + token}
+    ordered, errors = 0, []
+    for _ in range(attempts):
+        try:
+            added = client.post('/cart', json={'product_id': 1}, headers=headers)
+            if added.status_code == 409:
+                continue
+            placed = client.post('/checkout', headers=headers)
+            if placed.status_code == 201:
+                ordered += sum(item['quantity'] for item in placed.get_json()['ordered_items'])
+            elif placed.status_code != 409:
+                errors.append('%d %s' % (placed.status_code, placed.get_data(as_text=True)))
+        except Exception as exc:
+            errors.append(repr(exc))
+    results.put((ordered, errors))
+
+
+def test_parallel_checkouts_do_not_oversell(app):
+    with app.app_context():
+        db.session.add(Product(id=1, name='Limited product', category='Books', price=1.0, stock=STOCK))
+        for number in range(PROCESSES):
+            db.session.add(User(username='buyer%d' % number, password='-'))
+        db.session.commit()
+        uri = app.config['SQLALCHEMY_DATABASE_URI']
+
+    ctx = multiprocessing.get_context('spawn')
+    results = ctx.Queue()
+    workers = [ctx.Process(target=buyer, args=(uri, 'buyer%d' % number, ATTEMPTS, results))
+               for number in range(PROCESSES)]
+    for worker in workers:
+        worker.start()
+    reported, errors = 0, []
+    for _ in workers:
+        ordered, worker_errors = results.get(timeout=120)
+        reported += ordered
+        errors += worker_errors
+    for worker in workers:
+        worker.join()
+
+    assert errors == []
+    with app.app_context():
+        left = db.session.get(Product, 1).stock
+        sold = db.session.query(func.coalesce(func.sum(OrderItem.quantity), 0)).scalar()
+    assert left >= 0
+    assert sold == reported
+    assert sold + left == STOCK
+    assert sold == STOCK  # Попыток вдвое больше остатка: склад распродан
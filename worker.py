@@ -0,0 +1,74 @@
+# Воркер фоновых задач. Можно запускать в нескольких процессах:
+#   python worker.py            # работать, пока не остановят (SIGTERM/Ctrl+C)
+#   python worker.py --once     # разобрать очередь и выйти
+import argparse
+import logging
+import signal
+import time
+
+from flask import current_app
+
+from app import create_app
+from extensions import db, denylist, job_queue
+from jobs import handler
+from models import Order
+from resources.cart import release_expired_reservations
+from snapshot import build
+
+log = logging.getLogger('worker')
+
+
+@handler('order_placed')
+def order_placed(payload):
+    # Точка расширения для пост-обработки заказа: письмо-подтверждение,
+    # аналитика и т. п. Пока только фиксируем событие в логе.
+    order = db.session.get(Order, payload['order_id'])
+    if order is None:
+        raise LookupError('Order %s not found' % payload['order_id'])
+    log.info('order %s placed by user %s, total %s', order.id, order.user_id, order.total_price)
+
+
+@handler('catalog_snapshot')
+def catalog_snapshot(payload):
+    # Пересборка покрывает все изменения, зафиксированные до её начала,
+    # поэтому остальные ожидающие задачи снимка снимаются с очереди
+    path = current_app.config['CATALOG_SNAPSHOT_PATH']
+    if not path:
+        return
+    job_queue.absorb(db.session, 'catalog_snapshot')
+    log.info('catalog snapshot: %d products', build(path))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--once', action='store_true', help='exit when the queue is empty')
+    parser.add_argument('--poll-interval', type=float, default=1.0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(name)s %(levelname)s %(message)s')
+
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+
+    with create_app().app_context():
+        requeued = job_queue.requeue_stale(db.session)
+        if requeued:
+            log.warning('%d stale jobs returned to the queue', requeued)
+        try:
+            while not stopping:
+                if job_queue.run_one(db.session):
+                    continue
+                released = release_expired_reservations()
+                if released:
+                    log.info('%d expired stock reservations released', released)
+                denylist.purge(db.session)
+                job_queue.purge(db.session)
+                if args.once:
+                    break
+                time.sleep(args.poll_interval)
+                job_queue.requeue_stale(db.session)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()